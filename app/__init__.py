@@ -1 +1 @@
-from .app import *
+from .app import create_app
@@ -0,0 +1,171 @@
+import fcntl
+import os
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from functools import cache, wraps
+
+from flask import Response
+
+from app.metrics import ADMISSION_REJECTED, ADMISSION_REQUESTS, ADMISSION_WAIT_SECONDS
+from app.settings import get_settings
+
+POLL_INTERVAL = 0.05
+
+# event streams hold their slot for minutes, a full lane answers 503 at once
+LANE_TIMEOUTS = {"events": 0}
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status: int, reason: str):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+
+
+def try_lock(directory: str, name: str, slots: int) -> int | None:
+    """Descriptor of the first free slot file locked, None if all are taken"""
+    for slot in range(slots):
+        fd = os.open(os.path.join(directory, f"{name}.{slot}"), os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            os.close(fd)
+    return None
+
+
+@cache
+def thread_budget() -> threading.BoundedSemaphore:
+    """
+    Threads of this worker that lane requests may hold, running or waiting,
+    one thread is always left to ping, branches and metrics
+    """
+    return threading.BoundedSemaphore(max(get_settings().threads - 1, 1))
+
+
+class Lane:
+    """
+    At most `limit` requests of the lane run at once over all workers and
+    threads sharing `directory`, up to `queue` more wait for `timeout`
+    seconds, none wait with a timeout of 0. Slots are locked files, a killed
+    worker releases its slots. Requests finding every thread of the worker
+    budget taken by lane requests are rejected without waiting.
+    """
+
+    def __init__(
+        self, name: str, limit: int, queue: int, timeout: float, directory: str
+    ):
+        self.name = name
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.directory = directory
+
+    @contextmanager
+    def slot(self):
+        if self.limit <= 0:
+            yield
+            return
+
+        budget = thread_budget()
+        if not budget.acquire(blocking=False):
+            ADMISSION_REJECTED.labels(self.name, "threads").inc()
+            raise AdmissionRejected(503, "All worker threads are busy")
+        try:
+            fd = self.lock()
+            ADMISSION_REQUESTS.labels(self.name, "running").inc()
+            try:
+                yield
+            finally:
+                ADMISSION_REQUESTS.labels(self.name, "running").dec()
+                os.close(fd)
+        finally:
+            budget.release()
+
+    def lock(self) -> int:
+        os.makedirs(self.directory, exist_ok=True)
+        start_time = time.perf_counter()
+        fd = try_lock(self.directory, f"{self.name}.run", self.limit)
+        if fd is None:
+            fd = self.wait(start_time)
+        ADMISSION_WAIT_SECONDS.labels(self.name).observe(
+            time.perf_counter() - start_time
+        )
+        return fd
+
+    def wait(self, start_time: float) -> int:
+        if self.timeout <= 0:
+            ADMISSION_REJECTED.labels(self.name, "full").inc()
+            raise AdmissionRejected(503, f"All {self.name} slots are taken")
+
+        queue_fd = try_lock(self.directory, f"{self.name}.queue", self.queue)
+        if queue_fd is None:
+            ADMISSION_REJECTED.labels(self.name, "queue_full").inc()
+            raise AdmissionRejected(429, f"Too many {self.name} requests")
+
+        ADMISSION_REQUESTS.labels(self.name, "waiting").inc()
+        try:
+            while time.perf_counter() - start_time < self.timeout:
+                time.sleep(POLL_INTERVAL)
+                fd = try_lock(self.directory, f"{self.name}.run", self.limit)
+                if fd is not None:
+                    return fd
+        finally:
+            ADMISSION_REQUESTS.labels(self.name, "waiting").dec()
+            os.close(queue_fd)
+
+        ADMISSION_REJECTED.labels(self.name, "timeout").inc()
+        raise AdmissionRejected(503, f"Timed out waiting for a {self.name} slot")
+
+
+lanes: dict[str, Lane] = {}
+
+
+def get_lane(name: str) -> Lane:
+    if name not in lanes:
+        settings = get_settings()
+        lanes[name] = Lane(
+            name,
+            getattr(settings, f"admission_{name}_limit"),
+            settings.admission_queue,
+            LANE_TIMEOUTS.get(name, settings.admission_timeout),
+            settings.admission_dir,
+        )
+    return lanes[name]
+
+
+def rejected_response(err: AdmissionRejected):
+    return (
+        {"status": "error", "details": str(err)},
+        err.status,
+        {"Retry-After": str(get_settings().admission_retry_after)},
+    )
+
+
+def admit(lane_name: str, rejected=rejected_response):
+    """
+    Run the view in a slot of the lane, answer 429 if the wait queue is full
+    and 503 if no slot is free within the timeout, or `rejected(err)` of the
+    view. Views without it (ping, branches, metrics) are never queued behind
+    heavy requests. Streamed responses keep the slot until their body is
+    closed.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            with ExitStack() as stack:
+                try:
+                    stack.enter_context(get_lane(lane_name).slot())
+                except AdmissionRejected as err:
+                    return rejected(err)
+
+                response = f(*args, **kwargs)
+                if isinstance(response, Response) and response.is_streamed:
+                    response.call_on_close(stack.pop_all().close)
+                return response
+
+        return decorated
+
+    return decorator
@@ -1,59 +1,88 @@
-import os
+import queue
 import re
 import time
-from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from functools import wraps
-from typing import Dict, List, TypedDict
-
-from flask import Flask, jsonify, request
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Tuple, TypedDict
+
+from flask import (
+    Blueprint,
+    Flask,
+    current_app,
+    jsonify,
+    request,
+    stream_with_context,
+)
 from flask_cors import CORS, cross_origin
 from flask_sqlalchemy import SQLAlchemy
-from marshmallow import Schema, ValidationError, fields
-from sqlalchemy.sql import desc, func
-
+from sqlalchemy import LargeBinary, cast, select
+from sqlalchemy.sql import desc, func, insert, tuple_
+
+from app import (
+    database,
+    events,
+    export,
+    metrics,
+    profiling,
+    response_cache,
+    single_flight,
+    symbol_search,
+)
+from app.admission import AdmissionRejected, admit
 from app.authentication import validate_auth
-from app.services.map_parser import parse_sections, save_parsed_data
-
-from app.settings import settings
-
-
-app = Flask(__name__)
-
-cors = CORS(app)
-app.config["CORS_HEADERS"] = "Content-Type"
-app.config["SQLALCHEMY_DATABASE_URI"] = settings.database_uri
-
-db = SQLAlchemy()
-db.init_app(app)
-
+from app.commands import (
+    archive_data_command,
+    backfill_paths_command,
+    create_tables_command,
+    index_symbols_command,
+    parse_map_command,
+)
+from app.services.elf_parser import parse_elf_symbols
+from app.services.map_file import MapFileError, MapFileTooLarge, open_map_file
+from app.services.map_parser import parse_map_file
 
-class MapFileRequestSchema(Schema):
-    commit_hash = fields.String(required=True)
-    commit_msg = fields.String(required=True)
-    branch_name = fields.String(required=True)
-    bss_size = fields.Integer(required=True)
-    text_size = fields.Integer(required=True)
-    rodata_size = fields.Integer(required=True)
-    data_size = fields.Integer(required=True)
-    free_flash_size = fields.Integer(required=True)
-    pull_id = fields.Integer(required=False)
-    pull_name = fields.String(required=False)
+from app.settings import get_settings
+from app.response_cache import cache_json, cached_bodies, cached_json
 
 
-def time_it(func):
-    """decorator to time a function"""
+db = SQLAlchemy(session_options={"class_": database.RoutingSession})
+api = Blueprint("api", __name__)
 
-    @wraps(func)
-    def timeit_wrapper(*args, **kwargs):
-        start_time = time.perf_counter()
-        result = func(*args, **kwargs)
-        end_time = time.perf_counter()
-        total_time = end_time - start_time
-        print(f"Function {func.__name__}{args} {kwargs} Took {total_time:.4f} seconds")
-        return result
 
-    return timeit_wrapper
+def create_app() -> Flask:
+    """
+    Create the application, database connections are opened on first use
+    and tables are created by `flask create-tables`, not here
+    """
+    app = Flask(__name__)
+
+    CORS(app)
+    app.config["CORS_HEADERS"] = "Content-Type"
+
+    database.init_app(app, db, get_settings())
+    app.register_blueprint(api)
+
+    # backfill uses the models of this module
+    from app.backfill import backfill_command
+
+    app.cli.add_command(archive_data_command)
+    app.cli.add_command(backfill_command)
+    app.cli.add_command(backfill_paths_command)
+    app.cli.add_command(create_tables_command)
+    app.cli.add_command(export.export_command)
+    app.cli.add_command(index_symbols_command)
+    app.cli.add_command(parse_map_command)
+    metrics.init_app(app)
+    profiling.init_app(app)
+    single_flight.init_app(app)
+    response_cache.init_app(app)
+    events.init_app(app)
+    # responses are prewarmed one at a time, off the request threads
+    app.extensions["prewarm"] = ThreadPoolExecutor(
+        max_workers=1, thread_name_prefix="prewarm"
+    )
+    return app
 
 
 def cache_it():
@@ -94,6 +123,19 @@ class Data(db.Model):  # type: ignore
     name = db.Column(db.Text, nullable=False)
     lib = db.Column(db.Text, nullable=False)
     obj_name = db.Column(db.Text, nullable=False)
+    # flipper_path of lib and obj_name computed at ingest, NULL in rows
+    # stored before it until `flask backfill-paths`, Text like obj_name, so
+    # indexes on MySQL cover a prefix
+    path = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.Index(
+            "ix_data_header_id_path", "header_id", "path", mysql_length={"path": 255}
+        ),
+        # builds of symbols found by symbol search
+        db.Index("ix_data_name", "name", mysql_length=255),
+        db.Index("ix_data_path", "path", mysql_length=255),
+    )
 
     @property
     def serialize(self):
@@ -106,9 +148,51 @@ class Data(db.Model):  # type: ignore
             "name": self.name,
             "lib": self.lib,
             "obj_name": self.obj_name,
+            "path": self.path,
         }
 
 
+class DataArchive(db.Model):  # type: ignore
+    """
+    Cold data rows, sections out of INTERESTING_SECTIONS and zero sizes,
+    kept by the `archive` ingest profile and never read by the endpoints
+    """
+
+    __tablename__ = "data_archive"
+    header_id = db.Column(db.Integer, db.ForeignKey("header.id"))
+    id = db.Column(db.Integer, primary_key=True, nullable=False, autoincrement=True)
+    section = db.Column(db.Text, nullable=False)
+    address = db.Column(db.Text, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.Text, nullable=False)
+    lib = db.Column(db.Text, nullable=False)
+    obj_name = db.Column(db.Text, nullable=False)
+    path = db.Column(db.Text, nullable=True)
+
+
+class Symbol(db.Model):  # type: ignore
+    """Distinct symbol names and object paths of data rows, for search"""
+
+    __tablename__ = "symbol"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    kind = db.Column(db.String(8), nullable=False)
+    value = db.Column(db.Text, nullable=False)
+    # unique key of kind and value, long names do not fit a unique index
+    value_hash = db.Column(db.String(40), nullable=False, unique=True)
+
+    __table_args__ = (
+        db.Index("ix_symbol_kind_value", "kind", "value", mysql_length={"value": 255}),
+    )
+
+
+class SymbolTrigram(db.Model):  # type: ignore
+    """Lowercase trigrams of symbol values, posting lists of the search"""
+
+    __tablename__ = "symbol_trigram"
+    trigram = db.Column(db.String(3), primary_key=True)
+    symbol_id = db.Column(db.Integer, db.ForeignKey("symbol.id"), primary_key=True)
+
+
 class DataTypedDict(TypedDict):
     header_id: int
     id: int
@@ -118,6 +202,7 @@ class DataTypedDict(TypedDict):
     name: str
     lib: str
     obj_name: str
+    path: str | None
 
 
 class Header(db.Model):  # type: ignore
@@ -152,6 +237,11 @@ class Header(db.Model):  # type: ignore
     pullrequest_id = db.Column(db.Integer, nullable=True)
     pullrequest_name = db.Column(db.String(128), unique=False, nullable=True)
 
+    # builds of a branch by time: previous build, branch lists and ranges
+    __table_args__ = (
+        db.Index("ix_header_branch_name_datetime", "branch_name", "datetime"),
+    )
+
     @property
     def serialize(self):
         """Return object data in easily serializable format"""
@@ -171,10 +261,6 @@ class Header(db.Model):  # type: ignore
         }
 
 
-with app.app_context():
-    db.create_all()
-
-
 INTERESTING_SECTIONS = [
     ".isr_vector",
     ".text",
@@ -191,7 +277,7 @@ INTERESTING_SECTIONS = [
 
 class HashDataHelper:
     def hash_data(
-        self, lib: str, obj_name: str, name: str, section: str
+        self, lib: str, obj_name: str, name: str, section: str, path: str | None
     ) -> DataTypedDict:
         value: DataTypedDict = {
             "header_id": 0,
@@ -202,6 +288,7 @@ class HashDataHelper:
             "name": name,
             "lib": lib,
             "obj_name": obj_name,
+            "path": path,
         }
         return value
 
@@ -222,7 +309,9 @@ class HashData:
             helper = HashDataHelper()
             hash_key = helper.hash_key(d)
             if hash_key not in self.hash:
-                self.hash[hash_key] = helper.hash_data(lib, obj_name, name, section)
+                self.hash[hash_key] = helper.hash_data(
+                    lib, obj_name, name, section, d["path"]
+                )
             self.hash[hash_key]["size"] += size
 
     def get_hashed_data(self) -> Dict[str, DataTypedDict]:
@@ -259,15 +348,70 @@ class DiffHashData:
         return self.diff
 
 
-def get_commits_by_branch_id(branch_id: int) -> List[DataTypedDict]:
-    """Get all commits by branch id"""
-    result = (
-        Data.query.filter(Data.header_id == branch_id)
-        .filter(Data.section.in_(INTERESTING_SECTIONS))
-        .filter(Data.size > 0)
-        .all()
-    )
-    return [row.serialize for row in result]
+def data_insert_rows(header_id: int, parsed_data) -> list[dict]:
+    """Data rows of a parsed map file or ELF for a bulk insert"""
+    paths: dict[tuple[str, str], str] = {}
+    rows = []
+    for section, address, size, name, lib, obj_name in parsed_data.data_rows():
+        if (path := paths.get((lib, obj_name))) is None:
+            path = paths[lib, obj_name] = flipper_path(lib, obj_name)
+        rows.append(
+            {
+                "header_id": header_id,
+                "section": section,
+                "address": address,
+                "size": size,
+                "name": name,
+                "lib": lib,
+                "obj_name": obj_name,
+                "path": path,
+            }
+        )
+    return rows
+
+
+def is_hot_row(row: dict) -> bool:
+    """Row returned by the endpoints, see `get_commits_by_branch_id`"""
+    return row["section"] in INTERESTING_SECTIONS and row["size"] > 0
+
+
+def insert_data_rows(executor, header_id: int, parsed_data, profile: str) -> int:
+    """
+    Insert data rows of a build with a session or connection: `all` stores
+    every row in data, `archive` stores hot rows in data and the others in
+    data_archive, `hot` drops the others. Returns rows inserted into data.
+    """
+    rows = data_insert_rows(header_id, parsed_data)
+    if profile != "all":
+        cold_rows = [row for row in rows if not is_hot_row(row)]
+        rows = [row for row in rows if is_hot_row(row)]
+        if profile == "archive" and cold_rows:
+            executor.execute(insert(DataArchive), cold_rows)
+    if rows:
+        executor.execute(insert(Data), rows)
+        symbol_search.index_symbols(
+            executor, rows if profile != "all" else list(filter(is_hot_row, rows))
+        )
+    return len(rows)
+
+
+def get_commits_by_branch_id(
+    branch_id: int, path: str | None = None
+) -> List[DataTypedDict]:
+    """Get all commits by branch id, only of object files under `path`"""
+    with metrics.measure("db_query"):
+        query = (
+            Data.query.filter(Data.header_id == branch_id)
+            .filter(Data.section.in_(INTERESTING_SECTIONS))
+            .filter(Data.size > 0)
+        )
+        if path:
+            # range of the (header_id, path) index
+            query = query.filter(Data.path.startswith(path, autoescape=True))
+        result = query.all()
+        result = [row.serialize for row in result]
+    metrics.observe_rows("db_query", len(result))
+    return result
 
 
 def minify_path(path: str):
@@ -292,41 +436,49 @@ def flipper_path(lib, obj_name):
     return path
 
 
+def data_path(entry: DataTypedDict) -> str:
+    """Path stored at ingest, computed for rows stored before the column"""
+    return entry["path"] or flipper_path(entry["lib"], entry["obj_name"])
+
+
 class Sections:
-    def __init__(self, data: List[DataTypedDict]):
+    def __init__(self, data: Iterable[DataTypedDict]):
         self.sections = {}
         for entry in data:
-            section = entry["section"]
+            self.add(entry)
 
-            if section not in self.sections:
-                self.sections[section] = {"size": 0, "objects": {}}
-            current_section = self.sections[section]
-            current_section["size"] += entry["size"]
+    def add(self, entry: DataTypedDict) -> None:
+        section = entry["section"]
 
-            obj_name = flipper_path(entry["lib"], entry["obj_name"])
-            if obj_name not in current_section["objects"]:
-                current_section["objects"][obj_name] = {
-                    "size": 0,
-                    "symbols": {},
-                }
-            current_object = current_section["objects"][obj_name]
-            current_object["size"] += entry["size"]
+        if section not in self.sections:
+            self.sections[section] = {"size": 0, "objects": {}}
+        current_section = self.sections[section]
+        current_section["size"] += entry["size"]
 
-            symbol_name = entry["name"]
-            if symbol_name not in current_object["symbols"]:
-                current_object["symbols"][symbol_name] = 0
+        obj_name = data_path(entry)
+        if obj_name not in current_section["objects"]:
+            current_section["objects"][obj_name] = {
+                "size": 0,
+                "symbols": {},
+            }
+        current_object = current_section["objects"][obj_name]
+        current_object["size"] += entry["size"]
 
-            current_object["symbols"][symbol_name] += entry["size"]
+        symbol_name = entry["name"]
+        if symbol_name not in current_object["symbols"]:
+            current_object["symbols"][symbol_name] = 0
+
+        current_object["symbols"][symbol_name] += entry["size"]
 
     def get_sections(self):
         return self.sections
 
 
 class Files:
-    def __init__(self, data: List[DataTypedDict]):
+    def __init__(self, data: Iterable[DataTypedDict]):
         self.files = {"sections": {}, "next": {}}
         for d in data:
-            path = flipper_path(d["lib"], d["obj_name"])
+            path = data_path(d)
             name = d["name"]
             section = d["section"]
             size = d["size"]
@@ -398,8 +550,540 @@ class Files:
         return self.files
 
 
-@app.route("/api/v0/commit_diff_data", methods=["GET"])
+# example: 0.69.0
+RELEASE_PATTERN = re.compile(r"^\d+\.\d+\.\d+$")
+# example: 0.69.0-rc
+RELEASE_CANDIDATE_PATTERN = re.compile(r"^\d+\.\d+\.\d+-rc$")
+
+
+def branch_category(branch_name: str) -> str:
+    """main, release, release_candidate, pull_request or misc"""
+    if branch_name == "dev":
+        return "main"
+    if RELEASE_PATTERN.match(branch_name):
+        return "release"
+    if RELEASE_CANDIDATE_PATTERN.match(branch_name):
+        return "release_candidate"
+    if "/" in branch_name:
+        return "pull_request"
+    return "misc"
+
+
+def header_keys(branch_ids: Iterable[int]) -> Dict[int, tuple]:
+    """
+    Ids with commit and time of their headers, so a recreated database does
+    not get responses of old headers, unknown ids alone
+    """
+    with metrics.measure("db_query"):
+        headers = {
+            header.id: header
+            for header in Header.query.filter(Header.id.in_(branch_ids))
+        }
+
+    keys = {}
+    for branch_id in branch_ids:
+        header = headers.get(branch_id)
+        if header is None:
+            keys[branch_id] = (branch_id,)
+        else:
+            keys[branch_id] = (branch_id, header.commit, str(header.datetime))
+    return keys
+
+
+def cache_key(endpoint: str, *branch_ids: int) -> tuple:
+    """Response cache key of commit data of the headers"""
+    keys = header_keys(branch_ids)
+    return (endpoint, *(keys[branch_id] for branch_id in branch_ids))
+
+
+def parse_branch_ids(value: str | None, limit: int) -> List[int]:
+    """Unique header ids of a comma separated argument, at most `limit`"""
+    if not value:
+        raise ValueError("missing branch_ids")
+    try:
+        branch_ids = [int(branch_id) for branch_id in value.split(",")]
+    except ValueError:
+        raise ValueError("branch_ids must be header ids")
+    if len(set(branch_ids)) != len(branch_ids):
+        raise ValueError("branch_ids must be unique")
+    if len(branch_ids) > limit:
+        raise ValueError(f"at most {limit} branch_ids")
+    return branch_ids
+
+
+# rows fetched at once by the cursors of a merge diff
+MERGE_DIFF_ROWS = 1000
+
+
+def stream_commit_data(connection, branch_id: int) -> Iterator[tuple]:
+    """
+    (lib, obj_name, name, section), path and summed size of the rows of a
+    build in binary key order, which is the order of Python strings
+    """
+    key_columns = [Data.lib, Data.obj_name, Data.name, Data.section]
+    rows = connection.execution_options(yield_per=MERGE_DIFF_ROWS).execute(
+        select(*key_columns, Data.path, Data.size)
+        .where(Data.header_id == branch_id)
+        .where(Data.section.in_(INTERESTING_SECTIONS))
+        .where(Data.size > 0)
+        .order_by(*(cast(column, LargeBinary) for column in key_columns))
+    )
+
+    key = path = None
+    size = 0
+    for lib, obj_name, name, section, row_path, row_size in rows:
+        row_key = (lib, obj_name, name, section)
+        if row_key != key:
+            if key is not None:
+                if row_key < key:
+                    raise ValueError(f"Data of {branch_id} is not in key order")
+                yield key, path, size
+            key, path, size = row_key, row_path, 0
+        size += row_size
+    if key is not None:
+        yield key, path, size
+
+
+def merge_diff(current: Iterator[tuple], previous: Iterator[tuple]):
+    """Entries of DiffHashData from two builds streamed in key order"""
+    helper = HashDataHelper()
+    item_current = next(current, None)
+    item_previous = next(previous, None)
+    while item_current is not None or item_previous is not None:
+        if item_previous is None or (
+            item_current is not None and item_current[0] < item_previous[0]
+        ):
+            key, path, size = item_current
+            item_current = next(current, None)
+        elif item_current is None or item_previous[0] < item_current[0]:
+            key, path, size = item_previous
+            size = -size
+            item_previous = next(previous, None)
+        else:
+            key, path, size = item_current
+            path = path or item_previous[1]
+            size -= item_previous[2]
+            item_current = next(current, None)
+            item_previous = next(previous, None)
+
+        if size != 0:
+            lib, obj_name, name, section = key
+            entry = helper.hash_data(lib, obj_name, name, section, path)
+            entry["size"] = size
+            yield entry
+
+
+def commit_merge_diff_data(branch_id_current: int, branch_id_previous: int) -> dict:
+    """
+    commit_diff_data merging both builds read in key order by two cursors,
+    memory grows with the difference, not with the builds
+    """
+    engine = db.session.get_bind()
+    with engine.connect() as current, engine.connect() as previous:
+        diff = merge_diff(
+            stream_commit_data(current, branch_id_current),
+            stream_commit_data(previous, branch_id_previous),
+        )
+        sections = Sections([])
+
+        def entries():
+            for entry in diff:
+                sections.add(entry)
+                yield entry
+
+        with metrics.measure("aggregate_merge_diff"):
+            files = Files(entries())
+
+    return {
+        "sections": sections.get_sections(),
+        "files": files.get_files(),
+    }
+
+
+def commit_diff_data(branch_id_current: int, branch_id_previous: int) -> dict:
+    """Sections and files trees of the size difference between two commits"""
+    if get_settings().diff_mode == "merge":
+        return commit_merge_diff_data(branch_id_current, branch_id_previous)
+
+    data_current = get_commits_by_branch_id(branch_id_current)
+    data_previous = get_commits_by_branch_id(branch_id_previous)
+    with metrics.measure("aggregate_hash"):
+        hash_current = HashData(data_current)
+        hash_previous = HashData(data_previous)
+    with metrics.measure("aggregate_diff"):
+        diff = DiffHashData(hash_current, hash_previous)
+    metrics.observe_rows("aggregate_diff", len(diff.get_diff()))
+    with metrics.measure("aggregate_sections"):
+        sections = Sections(diff.get_diff())
+    with metrics.measure("aggregate_files"):
+        files = Files(diff.get_diff())
+
+    return {
+        "sections": sections.get_sections(),
+        "files": files.get_files(),
+    }
+
+
+def commit_brief_data(branch_id: int) -> dict:
+    """Sections and files trees of a commit"""
+    return brief_data(get_commits_by_branch_id(branch_id))
+
+
+def brief_data(data: List[dict]) -> dict:
+    """Sections and files trees of serialized data rows of a commit"""
+    with metrics.measure("aggregate_sections"):
+        sections = Sections(data)
+    with metrics.measure("aggregate_files"):
+        files = Files(data)
+
+    return {
+        "sections": sections.get_sections(),
+        "files": files.get_files(),
+    }
+
+
+MAX_BRIEF_BATCH_BUILDS = 16
+BRIEF_BATCH_ROWS = 1000
+
+
+def commit_brief_data_batch(branch_ids: List[int]) -> Iterator[Tuple[int, dict]]:
+    """
+    commit_brief_data of several commits from one query of their rows, read
+    in header id order through a server-side cursor and aggregated one build
+    at a time, memory holds the rows of a single build
+    """
+    rows = db.session.execute(
+        select(
+            Data.header_id,
+            Data.id,
+            Data.section,
+            Data.address,
+            Data.size,
+            Data.name,
+            Data.lib,
+            Data.obj_name,
+            Data.path,
+        )
+        .where(Data.header_id.in_(branch_ids))
+        .where(Data.section.in_(INTERESTING_SECTIONS))
+        .where(Data.size > 0)
+        .order_by(Data.header_id, Data.id),
+        execution_options={"yield_per": BRIEF_BATCH_ROWS},
+    )
+
+    missing = set(branch_ids)
+    row_count = 0
+    for branch_id, build_rows in groupby(rows, key=lambda row: row.header_id):
+        # same dicts as Data.serialize
+        data = [row._asdict() for row in build_rows]
+        row_count += len(data)
+        missing.discard(branch_id)
+        yield branch_id, brief_data(data)
+    metrics.observe_rows("db_query", row_count)
+
+    for branch_id in missing:
+        yield branch_id, brief_data([])
+
+
+MAX_COMPARE_BUILDS = 32
+
+
+def commit_compare_data(branch_ids: List[int], baseline: int | None) -> dict:
+    """
+    Section and object file sizes of the builds in one grouped query, sizes
+    are lists aligned with `branch_ids`, deltas are against `baseline`
+    """
+    with metrics.measure("db_query"):
+        headers = {
+            header.id: header
+            for header in Header.query.filter(Header.id.in_(branch_ids))
+        }
+        rows = (
+            db.session.query(
+                Data.header_id,
+                Data.section,
+                Data.path,
+                Data.lib,
+                Data.obj_name,
+                func.sum(Data.size),
+            )
+            .filter(Data.header_id.in_(branch_ids))
+            .filter(Data.section.in_(INTERESTING_SECTIONS))
+            .filter(Data.size > 0)
+            .group_by(
+                Data.header_id, Data.section, Data.path, Data.lib, Data.obj_name
+            )
+            .all()
+        )
+    metrics.observe_rows("db_query", len(rows))
+
+    positions = {branch_id: index for index, branch_id in enumerate(branch_ids)}
+    with metrics.measure("aggregate_compare"):
+        sections = {}
+        for header_id, section, path, lib, obj_name, size in rows:
+            position = positions[header_id]
+            if section not in sections:
+                sections[section] = {"sizes": [0] * len(branch_ids), "objects": {}}
+            current_section = sections[section]
+            current_section["sizes"][position] += int(size)
+
+            # rows stored before the path column have none
+            path = path or flipper_path(lib, obj_name)
+            if path not in current_section["objects"]:
+                current_section["objects"][path] = {"sizes": [0] * len(branch_ids)}
+            current_section["objects"][path]["sizes"][position] += int(size)
+
+        if baseline is not None:
+            base = positions[baseline]
+            for current_section in sections.values():
+                for entry in [current_section, *current_section["objects"].values()]:
+                    entry["deltas"] = [
+                        size - entry["sizes"][base] for size in entry["sizes"]
+                    ]
+
+    return {
+        "builds": [
+            headers[branch_id].serialize if branch_id in headers else None
+            for branch_id in branch_ids
+        ],
+        "baseline": baseline,
+        "sections": sections,
+    }
+
+
+MAX_GROWTH_BUILDS = 1000
+MAX_GROWTH_TOP = 100
+# builds of one steps query, bounds rows held at once
+GROWTH_CHUNK_BUILDS = 100
+
+
+def growth_builds(header_from: Header, header_to: Header) -> List[Header]:
+    """
+    `header_from`, dev builds between the two headers and `header_to`,
+    more than MAX_GROWTH_BUILDS builds means the range is too long
+    """
+    with metrics.measure("db_query"):
+        dev_builds = (
+            Header.query.filter(Header.branch_name == "dev")
+            # builds of the same second are ordered by id
+            .filter(
+                tuple_(Header.datetime, Header.id)
+                > tuple_(header_from.datetime, header_from.id)
+            )
+            .filter(
+                tuple_(Header.datetime, Header.id)
+                < tuple_(header_to.datetime, header_to.id)
+            )
+            .order_by(Header.datetime, Header.id)
+            .limit(MAX_GROWTH_BUILDS - 1)
+            .all()
+        )
+    return [header_from, *dev_builds, header_to]
+
+
+def symbol_size_rows(header_ids: List[int], entries: List[DataTypedDict]):
+    """(header id, hash key, size) of the symbols of `entries` in the builds"""
+    keys = {HashDataHelper().hash_key(entry) for entry in entries}
+    rows = (
+        db.session.query(
+            Data.header_id,
+            Data.lib,
+            Data.obj_name,
+            Data.name,
+            Data.section,
+            func.sum(Data.size),
+        )
+        .filter(Data.header_id.in_(header_ids))
+        .filter(Data.name.in_({entry["name"] for entry in entries}))
+        .filter(Data.section.in_(INTERESTING_SECTIONS))
+        .filter(Data.size > 0)
+        .group_by(Data.header_id, Data.lib, Data.obj_name, Data.name, Data.section)
+    )
+    for header_id, lib, obj_name, name, section, size in rows:
+        key = f"{lib}/{obj_name}/{name}/{section}"
+        if key in keys:
+            yield header_id, key, int(size)
+
+
+def object_size_rows(header_ids: List[int], entries: List[dict]):
+    """(header id, path, size) of the object files of `entries` in the builds"""
+    paths = {entry["path"] for entry in entries}
+    obj_names = {obj_name for entry in entries for obj_name in entry["obj_names"]}
+    rows = (
+        db.session.query(
+            Data.header_id, Data.path, Data.lib, Data.obj_name, func.sum(Data.size)
+        )
+        .filter(Data.header_id.in_(header_ids))
+        .filter(Data.obj_name.in_(obj_names))
+        .filter(Data.section.in_(INTERESTING_SECTIONS))
+        .filter(Data.size > 0)
+        .group_by(Data.header_id, Data.path, Data.lib, Data.obj_name)
+    )
+    for header_id, path, lib, obj_name, size in rows:
+        path = path or flipper_path(lib, obj_name)
+        if path in paths:
+            yield header_id, path, int(size)
+
+
+def growth_steps(builds: List[Header], keys: List[str], size_rows) -> dict:
+    """
+    Size changes of `keys` between consecutive builds, builds are read
+    GROWTH_CHUNK_BUILDS at a time by `size_rows(header_ids)`
+    """
+    steps: dict[str, list] = {key: [] for key in keys}
+    previous: dict[str, int] = {}
+    for start in range(0, len(builds), GROWTH_CHUNK_BUILDS):
+        chunk = builds[start : start + GROWTH_CHUNK_BUILDS]
+        sizes: dict[int, dict[str, int]] = {header.id: {} for header in chunk}
+        with metrics.measure("db_query"):
+            for header_id, key, size in size_rows([header.id for header in chunk]):
+                sizes[header_id][key] = sizes[header_id].get(key, 0) + size
+
+        for header in chunk:
+            current = sizes[header.id]
+            for key in keys:
+                delta = current.get(key, 0) - previous.get(key, 0)
+                if delta and header is not builds[0]:
+                    steps[key].append(
+                        {
+                            "branch_id": header.id,
+                            "commit": header.commit,
+                            "datetime": header.datetime,
+                            "delta": delta,
+                        }
+                    )
+            previous = current
+    return steps
+
+
+def growth_report(builds: List[Header], top: int) -> dict:
+    """
+    Symbols and object files that grew the most from the first to the last
+    of `builds` with their size change in every build
+    """
+    header_from, header_to = builds[0], builds[-1]
+    data_from = get_commits_by_branch_id(header_from.id)
+    data_to = get_commits_by_branch_id(header_to.id)
+
+    with metrics.measure("aggregate_growth"):
+        hash_from = HashData(data_from).get_hashed_data()
+        hash_to = HashData(data_to).get_hashed_data()
+        symbols = []
+        for key in hash_from.keys() | hash_to.keys():
+            entry = hash_to.get(key) or hash_from[key]
+            size_from = hash_from[key]["size"] if key in hash_from else 0
+            size_to = hash_to[key]["size"] if key in hash_to else 0
+            if size_to > size_from:
+                symbols.append(
+                    entry
+                    | {
+                        "path": data_path(entry),
+                        "growth": size_to - size_from,
+                        "size_from": size_from,
+                        "size_to": size_to,
+                    }
+                )
+        symbols = sorted(symbols, key=lambda symbol: -symbol["growth"])[:top]
+
+        objects = {}
+        for data, size_key in ((data_from, "size_from"), (data_to, "size_to")):
+            for entry in data:
+                path = data_path(entry)
+                if path not in objects:
+                    objects[path] = {
+                        "path": path,
+                        "obj_names": set(),
+                        "size_from": 0,
+                        "size_to": 0,
+                    }
+                objects[path]["obj_names"].add(entry["obj_name"])
+                objects[path][size_key] += entry["size"]
+        for obj in objects.values():
+            obj["growth"] = obj["size_to"] - obj["size_from"]
+        objects = sorted(
+            (obj for obj in objects.values() if obj["growth"] > 0),
+            key=lambda obj: -obj["growth"],
+        )[:top]
+
+    if symbols:
+        keys = [HashDataHelper().hash_key(symbol) for symbol in symbols]
+        steps = growth_steps(
+            builds, keys, lambda header_ids: symbol_size_rows(header_ids, symbols)
+        )
+        for key, symbol in zip(keys, symbols):
+            symbol["steps"] = steps[key]
+    if objects:
+        steps = growth_steps(
+            builds,
+            [obj["path"] for obj in objects],
+            lambda header_ids: object_size_rows(header_ids, objects),
+        )
+        for obj in objects:
+            obj["steps"] = steps[obj["path"]]
+
+    for obj in objects:
+        del obj["obj_names"]
+    for symbol in symbols:
+        del symbol["header_id"], symbol["id"], symbol["address"], symbol["size"]
+    return {
+        "from": header_from.serialize,
+        "to": header_to.serialize,
+        "builds": len(builds),
+        "symbols": symbols,
+        "objects": objects,
+    }
+
+
+def previous_build(header: Header) -> Header | None:
+    """
+    Previous build of the branch, for the first build of other branches
+    the last dev build before it
+    """
+    previous = (
+        Header.query.filter(Header.branch_name == header.branch_name)
+        .filter(Header.id < header.id)
+        .order_by(desc(Header.id))
+        .first()
+    )
+    if previous is None and header.branch_name != "dev":
+        previous = (
+            Header.query.filter(Header.branch_name == "dev")
+            .filter(Header.datetime < header.datetime)
+            .order_by(desc(Header.datetime))
+            .first()
+        )
+    return previous
+
+
+def prewarm_commit_data(app: Flask, header_id: int) -> None:
+    """
+    Store brief data of a new build and its diff against the previous
+    build in the response cache, so the first dashboard visit is a hit
+    """
+    with app.app_context():
+        try:
+            flights = app.extensions["single_flight"]
+            key = cache_key("commit_brief_data", header_id)
+            flights.do(
+                key, lambda: cache_json(key, lambda: commit_brief_data(header_id))
+            )
+
+            previous = previous_build(db.session.get(Header, header_id))
+            if previous is not None:
+                key = cache_key("commit_diff_data", header_id, previous.id)
+                flights.do(
+                    key,
+                    lambda: cache_json(
+                        key, lambda: commit_diff_data(header_id, previous.id)
+                    ),
+                )
+        except Exception:
+            app.logger.exception(f"Prewarming commit data of {header_id} failed")
+
+
+@api.route("/api/v0/commit_diff_data", methods=["GET"])
 @cross_origin()
+@admit("aggregate")
 def api_v0_commit_diff_data():
     """Get data that differs between two commits"""
 
@@ -413,21 +1097,99 @@ def api_v0_commit_diff_data():
 
     branch_id_current = int(branch_ids[0])
     branch_id_previous = int(branch_ids[1])
-    hash_current = HashData(get_commits_by_branch_id(branch_id_current))
-    hash_previous = HashData(get_commits_by_branch_id(branch_id_previous))
-    diff = DiffHashData(hash_current, hash_previous)
-    sections = Sections(diff.get_diff())
-    files = Files(diff.get_diff())
+    return cached_json(
+        cache_key("commit_diff_data", branch_id_current, branch_id_previous),
+        lambda: commit_diff_data(branch_id_current, branch_id_previous),
+    )
 
-    response = {
-        "sections": sections.get_sections(),
-        "files": files.get_files(),
-    }
-    return jsonify(response)
+
+@api.route("/api/v0/commit_compare_data", methods=["GET"])
+@cross_origin()
+@admit("aggregate")
+def api_v0_commit_compare_data():
+    """
+    Compare up to MAX_COMPARE_BUILDS commits: sizes of sections and object
+    files of every commit and deltas against the baseline commit
+    """
+    try:
+        branch_ids = parse_branch_ids(
+            request.args.get("branch_ids"), MAX_COMPARE_BUILDS
+        )
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+
+    baseline = request.args.get("baseline")
+    if baseline is not None:
+        if not baseline.isdigit() or int(baseline) not in branch_ids:
+            return jsonify({"error": "baseline must be one of branch_ids"}), 400
+        baseline = int(baseline)
+
+    return cached_json(
+        cache_key("commit_compare_data", *branch_ids) + (("baseline", baseline),),
+        lambda: commit_compare_data(branch_ids, baseline),
+    )
+
+
+@api.route("/api/v0/growth_report", methods=["GET"])
+@cross_origin()
+@admit("aggregate")
+def api_v0_growth_report():
+    """
+    Top symbols and object files by growth from from_branch_id to
+    to_branch_id, with the dev commits that changed their size
+    """
+    from_branch_id = request.args.get("from_branch_id", "")
+    to_branch_id = request.args.get("to_branch_id", "")
+    top = request.args.get("top", "20")
+    if not (from_branch_id.isdigit() and to_branch_id.isdigit()):
+        return jsonify({"error": "from_branch_id and to_branch_id are required"}), 400
+    if not top.isdigit() or not 0 < int(top) <= MAX_GROWTH_TOP:
+        return jsonify({"error": f"top must be 1 to {MAX_GROWTH_TOP}"}), 400
+
+    with metrics.measure("db_query"):
+        header_from = db.session.get(Header, int(from_branch_id))
+        header_to = db.session.get(Header, int(to_branch_id))
+    if header_from is None or header_to is None:
+        return jsonify({"error": "Unknown branch id"}), 404
+    if (header_to.datetime, header_to.id) <= (header_from.datetime, header_from.id):
+        return jsonify({"error": "to_branch_id is not after from_branch_id"}), 400
+
+    builds = growth_builds(header_from, header_to)
+    if len(builds) > MAX_GROWTH_BUILDS:
+        error = f"range has more than {MAX_GROWTH_BUILDS} builds"
+        return jsonify({"error": error}), 400
+
+    # builds inserted into the range later change the report
+    key = cache_key("growth_report", header_from.id, header_to.id) + (
+        tuple(header.id for header in builds),
+        ("top", int(top)),
+    )
+    return cached_json(key, lambda: growth_report(builds, int(top)))
+
+
+@api.route("/api/v0/symbols/search", methods=["GET"])
+@cross_origin()
+@admit("aggregate")
+def api_v0_symbols_search():
+    """
+    Search symbol names or object paths by prefix, substring or trigram
+    similarity in the builds of a branch or header id range
+    """
+    from app.schemas import SymbolSearchRequestSchema, ValidationError
+
+    try:
+        params = SymbolSearchRequestSchema().load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+
+    with metrics.measure("db_query"):
+        result = symbol_search.search_symbols(db.session, params.pop("q"), **params)
+    return jsonify(result)
 
 
-@app.route("/api/v0/commit_brief_data", methods=["GET"])
+@api.route("/api/v0/commit_brief_data", methods=["GET"])
 @cross_origin()
+@admit("aggregate")
 def api_v0_commit_brief_data():
     """Get brief commit data"""
 
@@ -435,30 +1197,58 @@ def api_v0_commit_brief_data():
     if branch_id is None:
         return jsonify({"error": "Missing branch_id"}), 400
 
-    data = get_commits_by_branch_id(int(branch_id))
-    sections = Sections(data)
-    files = Files(data)
+    branch_id = int(branch_id)
+    return cached_json(
+        cache_key("commit_brief_data", branch_id),
+        lambda: commit_brief_data(branch_id),
+    )
 
-    response = {
-        "sections": sections.get_sections(),
-        "files": files.get_files(),
+
+@api.route("/api/v0/commit_brief_data_batch", methods=["GET"])
+@cross_origin()
+@admit("aggregate")
+def api_v0_commit_brief_data_batch():
+    """
+    Get brief commit data of up to MAX_BRIEF_BATCH_BUILDS commits by header
+    id, commits without a cached response are read in one query
+    """
+    try:
+        branch_ids = parse_branch_ids(
+            request.args.get("branch_ids"), MAX_BRIEF_BATCH_BUILDS
+        )
+    except ValueError as err:
+        return jsonify({"error": str(err)}), 400
+
+    keys = {
+        branch_id: ("commit_brief_data", key)
+        for branch_id, key in header_keys(branch_ids).items()
     }
-    return jsonify(response)
+    bodies = cached_bodies(keys, commit_brief_data_batch)
+    # bodies are JSON objects already, joined without parsing them again
+    body = b",".join(
+        b'"%d":%s' % (branch_id, bodies[branch_id]) for branch_id in branch_ids
+    )
+    return current_app.response_class(b"{" + body + b"}", mimetype="application/json")
 
 
-@app.route("/api/v0/commit_full_data", methods=["GET"])
+@api.route("/api/v0/commit_full_data", methods=["GET"])
 @cross_origin()
+@admit("aggregate")
 def api_v0_commit_full_data():
-    """Get full commit data"""
+    """Get full commit data, optionally only of object files under path"""
     branch_id = request.args.get("branch_id")
     if branch_id is None:
         return jsonify({"error": "Missing branch_id"}), 400
 
-    data = get_commits_by_branch_id(int(branch_id))
-    return jsonify(data)
+    branch_id = int(branch_id)
+    path = request.args.get("path")
+    key = cache_key("commit_full_data", branch_id)
+    if path:
+        key += (("path", path),)
+    return cached_json(key, lambda: get_commits_by_branch_id(branch_id, path))
 
 
-@app.route("/api/v0/branch", methods=["GET"])
+@api.route("/api/v0/branch", methods=["GET"])
 @cross_origin()
 def api_v0_branch():
     """
@@ -503,17 +1293,18 @@ def api_v0_branch():
     return jsonify(headers)
 
 
-@app.route("/api/v0/branches", methods=["GET"])
+@api.route("/api/v0/branches", methods=["GET"])
 @cross_origin()
 def api_v0_branches():
     """Get all branches, sorted by type"""
     session = db.session
-    headers = (
-        session.query(Header.branch_name, func.count(Header.branch_name))
-        .order_by(Header.datetime)
-        .group_by(Header.branch_name)
-        .all()
-    )
+    with metrics.measure("db_query"):
+        headers = (
+            session.query(Header.branch_name, func.count(Header.branch_name))
+            .order_by(Header.datetime)
+            .group_by(Header.branch_name)
+            .all()
+        )
 
     main_branches = []
     release_branches = []
@@ -521,22 +1312,18 @@ def api_v0_branches():
     misc_branches = []
     pull_request_user_branches = {}
 
-    # example: 0.69.0
-    release_pattern = re.compile(r"^\d+\.\d+\.\d+$")
-    # example: 0.69.0-rc
-    release_candidate_pattern = re.compile(r"^\d+\.\d+\.\d+-rc$")
-
     for header in headers:
         name = header[0]
         count = header[1]
+        category = branch_category(name)
 
-        if name == "dev":
+        if category == "main":
             main_branches.append({"branch_name": name, "count": count})
-        elif release_pattern.match(name):
+        elif category == "release":
             release_branches.append({"branch_name": name, "count": count})
-        elif release_candidate_pattern.match(name):
+        elif category == "release_candidate":
             release_candidate_branches.append({"branch_name": name, "count": count})
-        elif "/" in name:
+        elif category == "pull_request":
             username, _ = name.split("/", 1)
             if username not in pull_request_user_branches:
                 pull_request_user_branches[username] = {"branches": [], "count": 0}
@@ -563,24 +1350,43 @@ def api_v0_branches():
     )
 
 
-@app.route("/api/v0/map-file/analyse", methods=["POST"])
+@api.route("/api/v0/map-file/analyse", methods=["POST"])
 @cross_origin()
 @validate_auth
+@admit("upload")
 def api_v0_analyse_map_file():
     """Analyse map file"""
+    # marshmallow is imported by the first upload, not on worker start
+    from app.schemas import MapFileRequestSchema, ValidationError
+
+    settings = get_settings()
     try:
         result = MapFileRequestSchema().load(request.form)
     except ValidationError as err:
         return jsonify(err.messages), 400
 
-    if (map_file := request.files.get("map_file")) is None:
+    # ELF symbol table is ingested only if map file is not uploaded
+    field_name = "map_file" if "map_file" in request.files else "elf_file"
+    if (upload := request.files.get(field_name)) is None:
         return {"map_file": ["Missing data for required field."]}, 400
 
-    parsed_sections = parse_sections(map_file)
-    parsed_sections = save_parsed_data(parsed_sections)
+    try:
+        upload = open_map_file(
+            upload, upload.headers.get("Content-Encoding"), settings.map_file_max_size
+        )
+        if field_name == "elf_file":
+            parsed_sections = parse_elf_symbols(upload)
+        else:
+            parsed_sections = parse_map_file(
+                upload, settings.map_parser_workers, settings.map_parser_mmap
+            )
+    except MapFileTooLarge as err:
+        return {field_name: [str(err)]}, 413
+    except MapFileError as err:
+        return {field_name: [str(err)]}, 400
 
     header_new = Header(
-        datetime=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        datetime=datetime.now().replace(microsecond=0),
         commit=result["commit_hash"],
         commit_msg=result["commit_msg"],
         branch_name=result["branch_name"],
@@ -592,27 +1398,152 @@ def api_v0_analyse_map_file():
         pullrequest_id=result.get("pull_id"),
         pullrequest_name=result.get("pull_name"),
     )
-    db.session.add(header_new)
-    db.session.flush()
-
-    for parsed_section in parsed_sections:
-        data = Data(
-            header_id=header_new.id,
-            section=parsed_section["section_name"],
-            address=parsed_section["address"],
-            size=parsed_section["size"],
-            name=parsed_section["demangled_name"],
-            lib=parsed_section["module_name"],
-            obj_name=parsed_section["file_name"],
-        )
-        db.session.add(data)
+    with metrics.measure("db_insert"):
+        db.session.add(header_new)
+        db.session.flush()
 
-    db.session.commit()
+        rows = insert_data_rows(
+            db.session, header_new.id, parsed_sections, settings.ingest_profile
+        )
+        db.session.commit()
+    metrics.observe_rows("db_insert", rows)
+
+    current_app.extensions["events"].publish(build_event(header_new))
+    if current_app.extensions["response_cache"].enabled and branch_category(
+        header_new.branch_name
+    ) in settings.prewarm_branches.split(","):
+        current_app.extensions["prewarm"].submit(
+            prewarm_commit_data, current_app._get_current_object(), header_new.id
+        )
 
     return jsonify({"status": "ok"})
 
 
-@app.route("/api/v0/ping", methods=["GET"])
+@api.route("/api/v0/export", methods=["GET"])
+@cross_origin()
+@validate_auth
+@admit("export")
+def api_v0_export():
+    """
+    Data rows of builds chosen by header_ids or branch_name (since, until)
+    as gzip compressed CSV or Parquet, streamed in row groups
+    """
+    from app.schemas import ExportRequestSchema, ValidationError
+
+    try:
+        params = ExportRequestSchema().load(request.args)
+    except ValidationError as err:
+        return jsonify(err.messages), 400
+
+    query = export.export_select(
+        export.parse_header_ids(params.get("header_ids")),
+        params.get("branch_name"),
+        params.get("since"),
+        params.get("until"),
+    )
+    chunks = export.export_chunks(
+        params["format"], export.row_groups(db.session, query)
+    )
+
+    extension, mimetype = export.FORMATS[params["format"]]
+    return current_app.response_class(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=export.{extension}"},
+    )
+
+
+def build_event(header: Header) -> dict:
+    """New build event: header id, branch, commit and section sizes"""
+    return {
+        "id": header.id,
+        "datetime": header.datetime.isoformat(),
+        "branch_name": header.branch_name,
+        "commit": header.commit,
+        "bss_size": header.bss_size,
+        "text_size": header.text_size,
+        "rodata_size": header.rodata_size,
+        "data_size": header.data_size,
+        "free_flash_size": header.free_flash_size,
+    }
+
+
+def events_rejected(err: AdmissionRejected):
+    """
+    EventSource stops reconnecting after a response other than 200, a client
+    finding the streams taken gets an empty stream telling it to reconnect
+    """
+    retry_after = get_settings().admission_retry_after
+    return current_app.response_class(
+        f": {err}\nretry: {retry_after * 1000}\n\n",
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "Retry-After": str(retry_after)},
+    )
+
+
+@api.route("/api/v0/events", methods=["GET"])
+@cross_origin()
+@admit("events", rejected=events_rejected)
+def api_v0_events():
+    """
+    Server-Sent Events stream of new builds, instead of polling branches.
+    Builds after Last-Event-ID header (or last_event_id argument) are sent
+    first, the stream is closed after EVENTS_STREAM_TIMEOUT and the client
+    reconnects with the id of the last event it got
+    """
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get(
+        "last_event_id"
+    )
+    if last_event_id is not None and not last_event_id.isdigit():
+        return jsonify({"error": "Last-Event-ID must be a header id"}), 400
+
+    settings = get_settings()
+    bus = current_app.extensions["events"]
+
+    def stream():
+        last_id = int(last_event_id) if last_event_id is not None else None
+        with bus.subscribe() as subscriber:
+            yield "retry: 5000\n\n"
+            if last_id is not None:
+                with metrics.measure("db_query"):
+                    missed = (
+                        Header.query.filter(Header.id > last_id)
+                        .order_by(Header.id)
+                        .all()
+                    )
+                for header in missed:
+                    last_id = header.id
+                    yield events.format_event(build_event(header))
+            # the stream does not query the database anymore
+            db.session.remove()
+
+            deadline = time.monotonic() + settings.events_stream_timeout
+            while (timeout := deadline - time.monotonic()) > 0:
+                try:
+                    event = subscriber.get(
+                        timeout=min(timeout, settings.events_keepalive)
+                    )
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if last_id is None or event["id"] > last_id:
+                    last_id = event["id"]
+                    yield events.format_event(event)
+
+    return current_app.response_class(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@api.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Prometheus metrics of all workers"""
+    return metrics.metrics_response()
+
+
+@api.route("/api/v0/ping", methods=["GET"])
 @cross_origin()
 def api_v0_ping():
     """Ping"""
@@ -620,4 +1551,4 @@ def api_v0_ping():
 
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
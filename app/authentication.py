@@ -2,17 +2,21 @@ import os
 from functools import wraps
 
 from flask import request
-from .settings import settings
+from .settings import get_settings
+
+
+def is_authenticated() -> bool:
+    token = None
+    if "Authorization" in request.headers:
+        token = request.headers["Authorization"].split(" ")[-1]
+
+    return bool(token) and get_settings().auth_token == token
 
 
 def validate_auth(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        if "Authorization" in request.headers:
-            token = request.headers["Authorization"].split(" ")[-1]
-
-        if not token or settings.auth_token != token:
+        if not is_authenticated():
             return {
                 "status": "error",
                 "details": "Invalid Authentication token!",
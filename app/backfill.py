@@ -0,0 +1,244 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from glob import glob
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.database import writer
+from app.services.map_file import MapFileError, open_map_file
+from app.services.map_parser import ParsedData, parse_map_file
+from app.settings import get_settings
+
+
+def read_manifest(path: str) -> list[dict]:
+    """
+    Builds of a JSON lines manifest, or of every *.json file in a directory:
+    analyse form fields, optional `datetime` (ISO) and `map_file` or
+    `elf_file` path relative to the manifest
+    """
+    if os.path.isdir(path):
+        entries = []
+        for file_name in sorted(glob(os.path.join(path, "*.json"))):
+            with open(file_name) as file:
+                entries.append(json.load(file) | {"source": file_name})
+        base_dir = path
+    else:
+        with open(path) as file:
+            entries = [
+                json.loads(line) | {"source": f"{path}:{number}"}
+                for number, line in enumerate(file, start=1)
+                if line.strip()
+            ]
+        base_dir = os.path.dirname(path)
+
+    for entry in entries:
+        for field_name in ("map_file", "elf_file"):
+            if field_name in entry:
+                entry[field_name] = os.path.join(base_dir, entry[field_name])
+    return entries
+
+
+def build_file(entry: dict) -> str:
+    """Map file or ELF path, identifies the build in the progress file"""
+    return entry.get("map_file") or entry.get("elf_file") or ""
+
+
+def read_progress(path: str) -> set[str]:
+    try:
+        with open(path) as file:
+            return {line.rstrip("\n") for line in file}
+    except FileNotFoundError:
+        return set()
+
+
+def parse_build(entry: dict) -> ParsedData:
+    """Parse map file or ELF of a build, runs in the parser processes"""
+    from app.services.elf_parser import parse_elf_symbols
+
+    field_name = "map_file" if "map_file" in entry else "elf_file"
+    with open(entry[field_name], "rb") as file:
+        file = open_map_file(file, None, get_settings().map_file_max_size)
+        if field_name == "elf_file":
+            return parse_elf_symbols(file)
+        return parse_map_file(file)
+
+
+def insert_builds(app, builds: list[tuple[dict, ParsedData]], replace: bool) -> int:
+    """Insert a batch of builds in one transaction, returns inserted rows"""
+    from app.app import Data, DataArchive, Header, db, insert_data_rows
+
+    profile = get_settings().ingest_profile
+    rows = 0
+    with app.app_context(), writer(db.engine).begin() as connection:
+        for entry, parsed_data in builds:
+            header = {
+                "datetime": entry["datetime"],
+                "commit": entry["commit_hash"],
+                "commit_msg": entry["commit_msg"],
+                "branch_name": entry["branch_name"],
+                "bss_size": entry["bss_size"],
+                "text_size": entry["text_size"],
+                "rodata_size": entry["rodata_size"],
+                "data_size": entry["data_size"],
+                "free_flash_size": entry["free_flash_size"],
+                "pullrequest_id": entry.get("pull_id"),
+                "pullrequest_name": entry.get("pull_name"),
+            }
+            header_id = entry.get("header_id")
+            if header_id is not None and replace:
+                connection.execute(
+                    Header.__table__.update()
+                    .where(Header.id == header_id)
+                    .values(header)
+                )
+                for table in (Data, DataArchive):
+                    connection.execute(
+                        table.__table__.delete().where(table.header_id == header_id)
+                    )
+            else:
+                header_id = connection.execute(
+                    Header.__table__.insert().values(header)
+                ).inserted_primary_key[0]
+
+            rows += insert_data_rows(connection, header_id, parsed_data, profile)
+    return rows
+
+
+@click.command("backfill")
+@click.argument("manifest", type=click.Path(exists=True))
+@click.option("-j", "--jobs", default=os.cpu_count(), help="Parser processes")
+@click.option("--db-jobs", default=2, help="Concurrent insert transactions")
+@click.option("--batch-size", default=10, help="Builds per transaction")
+@click.option(
+    "--replace",
+    is_flag=True,
+    help="Replace data of builds with the same commit and branch, "
+    "instead of skipping them",
+)
+@click.option("--progress", help="Progress file, MANIFEST.progress by default")
+@with_appcontext
+def backfill_command(manifest, jobs, db_jobs, batch_size, replace, progress):
+    """
+    Parse map files of MANIFEST (JSON lines or directory of JSON files) in
+    a process pool and insert them in batches, builds recorded in the
+    progress file are skipped so an interrupted backfill can be rerun
+    """
+    from app.app import Header, db
+    from app.schemas import BackfillEntrySchema, ValidationError
+
+    app = current_app._get_current_object()
+    progress = progress or manifest.rstrip("/") + ".progress"
+    done = read_progress(progress)
+
+    existing = {
+        (commit, branch_name): header_id
+        for header_id, commit, branch_name in db.session.query(
+            Header.id, Header.commit, Header.branch_name
+        )
+    }
+    db.session.remove()
+
+    entries = []
+    builds_seen = set()
+    for entry in read_manifest(manifest):
+        if build_file(entry) in done:
+            continue
+        try:
+            entry |= BackfillEntrySchema().load(
+                {key: value for key, value in entry.items() if key != "source"}
+            )
+        except ValidationError as err:
+            raise click.ClickException(f"{entry['source']}: {err.messages}")
+        entry.setdefault("datetime", datetime.now().replace(microsecond=0))
+
+        build = (entry["commit_hash"], entry["branch_name"])
+        if build in builds_seen:
+            click.echo(f"{entry['source']}: duplicate build, skipped", err=True)
+            continue
+        builds_seen.add(build)
+        entry["header_id"] = existing.get((entry["commit_hash"], entry["branch_name"]))
+        if entry["header_id"] is None or replace:
+            entries.append(entry)
+
+    click.echo(
+        f"{len(entries)} builds to insert, {len(done)} done before, "
+        f"{jobs} parser processes"
+    )
+    if not entries:
+        return
+
+    start_time = time.perf_counter()
+    builds = rows = failed = 0
+
+    with (
+        open(progress, "a") as progress_file,
+        ProcessPoolExecutor(jobs) as parsers,
+        ThreadPoolExecutor(db_jobs) as inserters,
+    ):
+        parsing: deque[tuple[dict, Future]] = deque()
+        inserting: deque[tuple[list[dict], Future]] = deque()
+        batch = []
+
+        def finish_insert() -> None:
+            nonlocal builds, rows
+            batch_entries, future = inserting.popleft()
+            rows += future.result()
+            builds += len(batch_entries)
+            for entry in batch_entries:
+                progress_file.write(build_file(entry) + "\n")
+            progress_file.flush()
+            os.fsync(progress_file.fileno())
+
+            total_time = time.perf_counter() - start_time
+            click.echo(
+                f"{builds}/{len(entries)} builds, {rows} rows, "
+                f"{builds / total_time:.1f} builds/s"
+            )
+
+        def submit_batch() -> None:
+            nonlocal batch
+            if len(inserting) >= db_jobs:
+                finish_insert()
+            future = inserters.submit(insert_builds, app, batch, replace)
+            inserting.append(([entry for entry, _ in batch], future))
+            batch = []
+
+        def finish_parse() -> None:
+            nonlocal failed
+            entry, future = parsing.popleft()
+            try:
+                batch.append((entry, future.result()))
+            except (MapFileError, OSError) as err:
+                failed += 1
+                click.echo(f"{entry['source']}: {err}", err=True)
+                return
+            if len(batch) >= batch_size:
+                submit_batch()
+
+        # parsed builds wait for inserts, at most two per parser process
+        for entry in entries:
+            if len(parsing) >= jobs * 2:
+                finish_parse()
+            parsing.append((entry, parsers.submit(parse_build, entry)))
+        while parsing:
+            finish_parse()
+        if batch:
+            submit_batch()
+        while inserting:
+            finish_insert()
+
+    total_time = time.perf_counter() - start_time
+    click.echo(
+        f"Inserted {builds} builds ({rows} rows) in {total_time:.1f}s, "
+        f"{builds / total_time:.1f} builds/s, {rows / total_time:.0f} rows/s"
+        + (f", {failed} failed" if failed else "")
+    )
+    if replace and builds:
+        # replaced builds keep commit and datetime of their cache keys
+        app.extensions["response_cache"].clear()
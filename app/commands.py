@@ -0,0 +1,187 @@
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.database import add_missing_columns, writer
+from app.services.map_file import open_map_file
+from app.services.map_parser import parse_map_file
+from app.settings import get_settings
+
+
+@click.command("parse-map")
+@click.argument("map_file", type=click.File("rb"))
+@click.argument("report_file", type=click.File("w"))
+@click.option(
+    "-j", "--jobs", default=1, help="Parser processes, 1 to parse in a single thread"
+)
+@click.option("--mmap", is_flag=True, help="Parse memory-mapped map file")
+def parse_map_command(map_file, report_file, jobs, mmap):
+    """Parse map file(.map, gzip or zstd compressed) into report file(.map.all)"""
+    map_file = open_map_file(map_file, None, get_settings().map_file_max_size)
+    for (
+        section_name,
+        subsection_name,
+        address,
+        size,
+        demangled_name,
+        module_name,
+        file_name,
+        mangled_name,
+    ) in parse_map_file(map_file, jobs, mmap).rows():
+        report_file.write(
+            f"{section_name}\t"
+            f"{subsection_name}\t"
+            f"{address:x}\t"
+            f"{size}\t"
+            f"{demangled_name}\t"
+            f"{module_name}\t"
+            f"{file_name}\t"
+            f"{mangled_name}\n"
+        )
+
+
+@click.command("create-tables")
+@with_appcontext
+def create_tables_command():
+    """
+    Create missing database tables, nullable columns and indexes added to
+    the models are added to existing tables
+    """
+    db = current_app.extensions["sqlalchemy"]
+    start_time = time.perf_counter()
+
+    def log(statement):
+        click.echo(f"[{time.perf_counter() - start_time:.1f}s] {statement}")
+
+    # the replica gets the tables from the primary
+    db.create_all(bind_key=None)
+    for column in add_missing_columns(db.engine, db.metadata, log):
+        click.echo(f"Added column {column}")
+    elapsed = time.perf_counter() - start_time
+    click.echo(f"Database tables are created in {elapsed:.1f}s")
+
+
+@click.command("archive-data")
+@click.option("--drop", is_flag=True, help="Delete cold rows instead of archiving")
+@with_appcontext
+def archive_data_command(drop):
+    """
+    Move data rows out of INTERESTING_SECTIONS or of zero size, stored
+    before the hot/cold split, to data_archive one build at a time
+    """
+    from sqlalchemy import delete, insert, not_, select
+
+    from app.app import INTERESTING_SECTIONS, Data, DataArchive, Header
+
+    db = current_app.extensions["sqlalchemy"]
+    cold = not_(Data.section.in_(INTERESTING_SECTIONS) & (Data.size > 0))
+    columns = [
+        "header_id",
+        "section",
+        "address",
+        "size",
+        "name",
+        "lib",
+        "obj_name",
+        "path",
+    ]
+
+    header_ids = db.session.scalars(select(Header.id).order_by(Header.id)).all()
+    db.session.remove()
+
+    moved = 0
+    for header_id in header_ids:
+        rows = (Data.header_id == header_id) & cold
+        with writer(db.engine).begin() as connection:
+            if not drop:
+                archived = select(*(getattr(Data, column) for column in columns))
+                connection.execute(
+                    insert(DataArchive).from_select(columns, archived.where(rows))
+                )
+            moved += connection.execute(delete(Data).where(rows)).rowcount
+
+    action = "Deleted" if drop else "Archived"
+    click.echo(f"{action} {moved} rows of {len(header_ids)} builds")
+
+
+@click.command("backfill-paths")
+@with_appcontext
+def backfill_paths_command():
+    """
+    Store the path of data rows inserted before the path column, one build
+    per transaction, so path prefix queries find them
+    """
+    from sqlalchemy import bindparam, select, update
+
+    from app.app import Data, Header, flipper_path
+
+    db = current_app.extensions["sqlalchemy"]
+    data = Data.__table__
+    set_path = (
+        update(data)
+        .where(data.c.id == bindparam("row_id"))
+        .values(path=bindparam("row_path"))
+    )
+
+    header_ids = db.session.scalars(select(Header.id).order_by(Header.id)).all()
+    db.session.remove()
+
+    updated = 0
+    for header_id in header_ids:
+        with writer(db.engine).begin() as connection:
+            rows = connection.execute(
+                select(data.c.id, data.c.lib, data.c.obj_name).where(
+                    data.c.header_id == header_id, data.c.path.is_(None)
+                )
+            ).all()
+            if not rows:
+                continue
+
+            paths: dict[tuple[str, str], str] = {}
+            for _, lib, obj_name in rows:
+                if (lib, obj_name) not in paths:
+                    paths[lib, obj_name] = flipper_path(lib, obj_name)
+            connection.execute(
+                set_path,
+                [
+                    {"row_id": row_id, "row_path": paths[lib, obj_name]}
+                    for row_id, lib, obj_name in rows
+                ],
+            )
+            updated += len(rows)
+    click.echo(f"Stored path of {updated} rows of {len(header_ids)} builds")
+
+
+@click.command("index-symbols")
+@with_appcontext
+def index_symbols_command():
+    """
+    Add symbol names and object paths of builds stored before symbol search
+    to the search index, one build per transaction. Paths are searched in
+    the path column, run backfill-paths first.
+    """
+    from sqlalchemy import select
+
+    from app.app import INTERESTING_SECTIONS, Data, Header
+    from app.symbol_search import index_symbols
+
+    db = current_app.extensions["sqlalchemy"]
+    header_ids = db.session.scalars(select(Header.id).order_by(Header.id)).all()
+    db.session.remove()
+
+    added = 0
+    for header_id in header_ids:
+        with writer(db.engine).begin() as connection:
+            rows = connection.execute(
+                select(Data.name, Data.path)
+                .where(Data.header_id == header_id)
+                .where(Data.section.in_(INTERESTING_SECTIONS))
+                .where(Data.size > 0)
+                .distinct()
+            )
+            added += index_symbols(
+                connection, [{"name": name, "path": path} for name, path in rows]
+            )
+    click.echo(f"Added {added} symbols of {len(header_ids)} builds")
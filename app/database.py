@@ -0,0 +1,168 @@
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, inspect, text
+from sqlalchemy.schema import CreateColumn, CreateIndex
+from sqlalchemy.pool import QueuePool
+
+from app.metrics import DB_CONNECTIONS, DB_POOL_CONNECTIONS
+from app.settings import Settings
+
+REPLICA_BIND = "replica"
+READ_ONLY_METHODS = ("GET", "HEAD")
+# execution option of connections whose SQLite transactions begin IMMEDIATE
+WRITER_OPTION = "report_writer"
+
+
+def reads_from_replica() -> bool:
+    """GET requests only read, uploads write to the primary"""
+    return has_request_context() and request.method in READ_ONLY_METHODS
+
+
+def writes_in_request() -> bool:
+    return has_request_context() and request.method not in READ_ONLY_METHODS
+
+
+def writer(engine):
+    """`engine` for writers outside requests (commands), see tune_sqlite"""
+    return engine.execution_options(**{WRITER_OPTION: True})
+
+
+class RoutingSession(Session):
+    """Session querying the read replica, if configured, in read-only requests"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and reads_from_replica():
+            engines = self._db.engines
+            if REPLICA_BIND in engines:
+                return engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def engine_options(settings: Settings) -> dict:
+    """Pool options that are set, SQLAlchemy defaults are used for the rest"""
+    options = {
+        "pool_size": settings.database_pool_size,
+        "max_overflow": settings.database_max_overflow,
+        "pool_timeout": settings.database_pool_timeout,
+        "pool_recycle": settings.database_pool_recycle,
+    }
+    options = {key: value for key, value in options.items() if value is not None}
+    if settings.database_pool_pre_ping:
+        options["pool_pre_ping"] = True
+    return options
+
+
+def sqlite_pragmas(settings: Settings) -> list[str]:
+    """
+    Pragmas of every SQLite connection, busy_timeout first so that changing
+    the journal mode waits for connections of other workers
+    """
+    return [
+        f"PRAGMA busy_timeout = {settings.sqlite_busy_timeout}",
+        f"PRAGMA journal_mode = {settings.sqlite_journal_mode}",
+        f"PRAGMA synchronous = {settings.sqlite_synchronous}",
+        # negative size is in KiB instead of pages
+        f"PRAGMA cache_size = -{settings.sqlite_cache_size}",
+        f"PRAGMA mmap_size = {settings.sqlite_mmap_size}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+
+
+def tune_sqlite(engine, settings: Settings) -> None:
+    """
+    Set the pragmas on new connections and begin transactions in SQLAlchemy
+    instead of pysqlite. Transactions of write requests and of `writer`
+    connections begin IMMEDIATE and wait up to busy_timeout for the write
+    lock held by another worker or command, a deferred transaction upgrading
+    its read lock would fail at once.
+    """
+    pragmas = sqlite_pragmas(settings)
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def begin(connection):
+        immediate = writes_in_request() or connection.get_execution_options().get(
+            WRITER_OPTION, False
+        )
+        connection.exec_driver_sql("BEGIN IMMEDIATE" if immediate else "BEGIN")
+
+
+def observe_pool(bind: str, pool, returning: int = 0) -> None:
+    if not isinstance(pool, QueuePool):
+        return
+    DB_POOL_CONNECTIONS.labels(bind, "checked_out").set(pool.checkedout() - returning)
+    DB_POOL_CONNECTIONS.labels(bind, "idle").set(pool.checkedin() + returning)
+    DB_POOL_CONNECTIONS.labels(bind, "overflow").set(max(pool.overflow(), 0))
+
+
+def watch_pool(bind: str, engine) -> None:
+    pool = engine.pool
+
+    @event.listens_for(pool, "connect")
+    def count_connection(dbapi_connection, connection_record):
+        DB_CONNECTIONS.labels(bind).inc()
+
+    @event.listens_for(pool, "checkout")
+    def observe_checkout(dbapi_connection, connection_record, connection_proxy):
+        observe_pool(bind, pool)
+
+    @event.listens_for(pool, "checkin")
+    def observe_checkin(dbapi_connection, connection_record):
+        # checkin event comes before the connection is returned to the pool
+        observe_pool(bind, pool, returning=1)
+
+
+def init_app(app, db, settings: Settings) -> None:
+    app.config["SQLALCHEMY_DATABASE_URI"] = settings.database_uri
+    if settings.database_replica_uri:
+        app.config["SQLALCHEMY_BINDS"] = {REPLICA_BIND: settings.database_replica_uri}
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(settings)
+
+    db.init_app(app)
+    with app.app_context():
+        for bind, engine in db.engines.items():
+            watch_pool(bind or "primary", engine)
+            if engine.dialect.name == "sqlite":
+                tune_sqlite(engine, settings)
+
+
+def add_missing_columns(engine, metadata, log=lambda statement: None) -> list[str]:
+    """
+    Add columns and indexes of the models missing in existing tables,
+    create_all only creates missing tables. Added columns must be nullable.
+    Each statement is passed to `log` before it runs, index builds of large
+    tables take long.
+    """
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    added = []
+    with engine.begin() as connection:
+        for table in metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                definition = CreateColumn(column).compile(dialect=engine.dialect)
+                statement = (
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {definition}"
+                )
+                log(statement)
+                connection.execute(text(statement))
+                added.append(f"{table.name}.{column.name}")
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in indexes:
+                    continue
+                log(str(CreateIndex(index).compile(dialect=engine.dialect)))
+                index.create(connection)
+    return added
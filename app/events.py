@@ -0,0 +1,102 @@
+import json
+import os
+import queue
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+
+from app.metrics import EVENT_STREAMS
+from app.settings import get_settings
+
+MAX_EVENT_SIZE = 64 * 1024
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+class EventBus:
+    """
+    Fan-out of small JSON events to subscribers of all workers on the host:
+    every worker with subscribers binds a unix datagram socket in
+    `directory`, publish sends the event to every socket there and removes
+    sockets of workers that are gone
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.subscribers: set[queue.Queue] = set()
+        self.socket = None
+
+    def listen(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{os.getpid()}.{uuid.uuid4().hex[:12]}.sock"
+        path = os.path.join(self.directory, name)
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.socket.bind(path)
+        threading.Thread(target=self.receive, name="event-bus", daemon=True).start()
+
+    def receive(self) -> None:
+        while True:
+            data = self.socket.recv(MAX_EVENT_SIZE)
+            try:
+                event = json.loads(data)
+            except ValueError:
+                # not sent by publish, the receiver keeps running
+                continue
+            with self.lock:
+                subscribers = list(self.subscribers)
+            for subscriber in subscribers:
+                try:
+                    subscriber.put_nowait(event)
+                except queue.Full:
+                    # slow client, it resumes from Last-Event-ID on reconnect
+                    pass
+
+    @contextmanager
+    def subscribe(self):
+        subscriber = queue.Queue(SUBSCRIBER_QUEUE_SIZE)
+        with self.lock:
+            if self.socket is None:
+                self.listen()
+            self.subscribers.add(subscriber)
+        EVENT_STREAMS.inc()
+        try:
+            yield subscriber
+        finally:
+            EVENT_STREAMS.dec()
+            with self.lock:
+                self.subscribers.discard(subscriber)
+
+    def publish(self, event: dict) -> None:
+        data = json.dumps(event).encode()
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            sender.setblocking(False)
+            for name in names:
+                if not name.endswith(".sock"):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    sender.sendto(data, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # nobody listens, the worker is gone
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                except BlockingIOError:
+                    # receive buffer of a busy worker is full
+                    pass
+
+
+def init_app(app) -> None:
+    app.extensions["events"] = EventBus(get_settings().events_dir)
+
+
+def format_event(event: dict) -> str:
+    """Server-Sent Events message, id lets clients resume with Last-Event-ID"""
+    return f"id: {event['id']}\nevent: build\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,211 @@
+import csv
+import gzip
+import io
+import time
+from datetime import datetime
+from typing import Iterable, Iterator
+
+import click
+from flask.cli import with_appcontext
+
+ROW_GROUP_SIZE = 50_000
+
+# column name and Parquet type of the exported data rows
+COLUMNS = [
+    ("header_id", "int64"),
+    ("datetime", "timestamp[s]"),
+    ("commit", "string"),
+    ("branch_name", "string"),
+    ("pullrequest_id", "int64"),
+    ("section", "string"),
+    ("address", "string"),
+    ("size", "int64"),
+    ("name", "string"),
+    ("lib", "string"),
+    ("obj_name", "string"),
+]
+
+FORMATS = {
+    "csv": ("csv.gz", "application/gzip"),
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def export_select(
+    header_ids: list[int] | None = None,
+    branch_name: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    """Data rows of the chosen builds with the header columns of COLUMNS"""
+    from sqlalchemy import select
+
+    from app.app import Data, Header
+
+    query = (
+        select(
+            Header.id.label("header_id"),
+            Header.datetime,
+            Header.commit,
+            Header.branch_name,
+            Header.pullrequest_id,
+            Data.section,
+            Data.address,
+            Data.size,
+            Data.name,
+            Data.lib,
+            Data.obj_name,
+        )
+        .join(Header, Data.header_id == Header.id)
+        # order of the header_id index, the database does not sort the export
+        .order_by(Data.header_id, Data.id)
+    )
+    if header_ids:
+        query = query.where(Header.id.in_(header_ids))
+    if branch_name is not None:
+        query = query.where(Header.branch_name == branch_name)
+    if since is not None:
+        query = query.where(Header.datetime >= since)
+    if until is not None:
+        query = query.where(Header.datetime <= until)
+    return query
+
+
+def row_groups(session, query, size: int = ROW_GROUP_SIZE) -> Iterator[list]:
+    """Rows of `query` read through a server-side cursor, `size` at a time"""
+    result = session.execute(query, execution_options={"yield_per": size})
+    for rows in result.partitions():
+        yield rows
+
+
+class ChunkWriter(io.RawIOBase):
+    """Write-only file collecting the bytes written since the last `take`"""
+
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def csv_chunks(groups: Iterable[list]) -> Iterator[bytes]:
+    """Gzip compressed CSV with a header line, one chunk per row group"""
+    sink = ChunkWriter()
+    with io.TextIOWrapper(
+        gzip.GzipFile(fileobj=sink, mode="wb"), encoding="utf-8", newline=""
+    ) as text:
+        writer = csv.writer(text)
+        writer.writerow([name for name, _ in COLUMNS])
+        for rows in groups:
+            writer.writerows(rows)
+            text.flush()
+            yield sink.take()
+    yield sink.take()
+
+
+def parquet_chunks(groups: Iterable[list]) -> Iterator[bytes]:
+    """Parquet file with a row group per group of rows"""
+    # imported on first export, pyarrow is too heavy to load in every worker
+    import pyarrow
+    import pyarrow.parquet
+
+    schema = pyarrow.schema(
+        [(name, pyarrow.type_for_alias(type_name)) for name, type_name in COLUMNS]
+    )
+
+    def chunks():
+        sink = ChunkWriter()
+        with pyarrow.parquet.ParquetWriter(sink, schema, compression="zstd") as writer:
+            for rows in groups:
+                batch = pyarrow.record_batch(
+                    [
+                        pyarrow.array(column, field.type)
+                        for column, field in zip(zip(*rows), schema)
+                    ],
+                    schema=schema,
+                )
+                writer.write_batch(batch, row_group_size=len(rows))
+                yield sink.take()
+        yield sink.take()
+
+    return chunks()
+
+
+def export_chunks(export_format: str, groups: Iterable[list]) -> Iterator[bytes]:
+    if export_format == "parquet":
+        return parquet_chunks(groups)
+    return csv_chunks(groups)
+
+
+def parse_header_ids(value: str | None) -> list[int] | None:
+    if not value:
+        return None
+    return [int(header_id) for header_id in value.split(",")]
+
+
+@click.command("export")
+@click.argument("output", type=click.Path(dir_okay=False, writable=True))
+@click.option("--header-ids", help="Comma separated header ids")
+@click.option("--branch-name", help="Builds of the branch")
+@click.option("--since", type=click.DateTime(), help="Builds since the date")
+@click.option("--until", type=click.DateTime(), help="Builds until the date")
+@click.option(
+    "--format",
+    "export_format",
+    type=click.Choice(list(FORMATS)),
+    help="Taken from OUTPUT extension by default",
+)
+@click.option("--row-group-size", default=ROW_GROUP_SIZE, help="Rows per group")
+@with_appcontext
+def export_command(
+    output, header_ids, branch_name, since, until, export_format, row_group_size
+):
+    """
+    Export data rows of the chosen builds to OUTPUT as Parquet or gzip
+    compressed CSV, rows are read and written in row groups
+    """
+    from app.app import db
+
+    try:
+        header_ids = parse_header_ids(header_ids)
+    except ValueError:
+        raise click.BadParameter(
+            "must be comma separated ids", param_hint="--header-ids"
+        )
+    if not header_ids and branch_name is None:
+        raise click.UsageError("--header-ids or --branch-name is required")
+    if export_format is None:
+        export_format = "parquet" if output.endswith(".parquet") else "csv"
+
+    rows = 0
+
+    def counted(groups):
+        nonlocal rows
+        for group in groups:
+            rows += len(group)
+            yield group
+
+    start_time = time.perf_counter()
+    query = export_select(header_ids, branch_name, since, until)
+    chunks = export_chunks(
+        export_format, counted(row_groups(db.session, query, row_group_size))
+    )
+    with open(output, "wb") as output_file:
+        for chunk in chunks:
+            output_file.write(chunk)
+
+    click.echo(f"Exported {rows} rows in {time.perf_counter() - start_time:.1f}s")
@@ -0,0 +1,157 @@
+import os
+import time
+from contextlib import contextmanager
+
+import prometheus_client
+from flask import has_request_context, request
+from prometheus_client import multiprocess
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROWS_BUCKETS = (0, 10, 100, 1000, 5000, 10000, 25000, 50000, 100000, 250000)
+BYTES_BUCKETS = tuple(4**power for power in range(5, 16))
+
+
+def histogram(name: str, documentation: str, labels: list[str], buckets):
+    return prometheus_client.Histogram(name, documentation, labels, buckets=buckets)
+
+
+def counter(name: str, documentation: str, labels: list[str]):
+    return prometheus_client.Counter(name, documentation, labels)
+
+
+def gauge(name: str, documentation: str, labels: list[str]):
+    # workers report their own values, scrape shows the sum over live workers
+    return prometheus_client.Gauge(
+        name, documentation, labels, multiprocess_mode="livesum"
+    )
+
+
+REQUEST_SECONDS = histogram(
+    "report_request_seconds",
+    "Request duration",
+    ["endpoint", "status"],
+    SECONDS_BUCKETS,
+)
+PHASE_SECONDS = histogram(
+    "report_phase_seconds",
+    "Duration of request phases: parse, flatten, demangle, db_insert, db_query, "
+    "aggregate_hash, aggregate_diff, aggregate_sections, aggregate_files, serialize",
+    ["endpoint", "phase"],
+    SECONDS_BUCKETS,
+)
+PHASE_ROWS = histogram(
+    "report_phase_rows",
+    "Rows handled by request phases",
+    ["endpoint", "phase"],
+    ROWS_BUCKETS,
+)
+PAYLOAD_BYTES = histogram(
+    "report_payload_bytes",
+    "Request and response body size",
+    ["endpoint", "direction"],
+    BYTES_BUCKETS,
+)
+DB_POOL_CONNECTIONS = gauge(
+    "report_db_pool_connections",
+    "Pooled database connections by bind and state: checked_out, idle, overflow",
+    ["bind", "state"],
+)
+DB_CONNECTIONS = counter(
+    "report_db_connections",
+    "New database connections by bind, grows with pool_recycle and pre-ping",
+    ["bind"],
+)
+COALESCED_REQUESTS = counter(
+    "report_coalesced_requests",
+    "Requests answered with the result of an identical concurrent request "
+    "of the same worker (thread) or of another worker (worker)",
+    ["endpoint", "source"],
+)
+ADMISSION_REQUESTS = gauge(
+    "report_admission_requests",
+    "Requests of admission lanes (aggregate, upload, export, events) by state: "
+    "running, waiting",
+    ["lane", "state"],
+)
+ADMISSION_WAIT_SECONDS = histogram(
+    "report_admission_wait_seconds",
+    "Time admitted requests waited for a slot of the lane",
+    ["lane"],
+    SECONDS_BUCKETS,
+)
+ADMISSION_REJECTED = counter(
+    "report_admission_rejected",
+    "Requests rejected by admission lanes, reason: queue_full (429), timeout (503), "
+    "full (503, lanes that do not wait), threads (503, worker threads are taken)",
+    ["lane", "reason"],
+)
+RESPONSE_CACHE_REQUESTS = counter(
+    "report_response_cache_requests",
+    "Commit data requests by response cache result: hit, miss",
+    ["endpoint", "result"],
+)
+EVENT_STREAMS = gauge(
+    "report_event_streams",
+    "Open /api/v0/events streams",
+    [],
+)
+
+
+def endpoint_name() -> str:
+    if has_request_context():
+        return request.endpoint or "unknown"
+    return "cli"
+
+
+@contextmanager
+def measure(phase: str):
+    """Observe duration of the block as a phase of the current request"""
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASE_SECONDS.labels(endpoint_name(), phase).observe(
+            time.perf_counter() - start_time
+        )
+
+
+def observe_rows(phase: str, rows: int) -> None:
+    PHASE_ROWS.labels(endpoint_name(), phase).observe(rows)
+
+
+def init_app(app) -> None:
+    @app.before_request
+    def start_request_timer():
+        request.environ["report.start_time"] = time.perf_counter()
+        if request.content_length:
+            PAYLOAD_BYTES.labels(endpoint_name(), "request").observe(
+                request.content_length
+            )
+
+    @app.after_request
+    def observe_request(response):
+        start_time = request.environ.get("report.start_time")
+        if start_time is not None:
+            REQUEST_SECONDS.labels(endpoint_name(), response.status_code).observe(
+                time.perf_counter() - start_time
+            )
+        if not response.is_streamed:
+            PAYLOAD_BYTES.labels(endpoint_name(), "response").observe(
+                response.content_length or 0
+            )
+        return response
+
+
+def metrics_response() -> tuple[bytes, int, dict]:
+    """Metrics of all workers in Prometheus text format"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+
+    return (
+        prometheus_client.generate_latest(registry),
+        200,
+        {"Content-Type": prometheus_client.CONTENT_TYPE_LATEST},
+    )
@@ -0,0 +1,84 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+
+from flask import g, request
+
+from app.authentication import is_authenticated
+from app.settings import TRUE_VALUES, get_settings
+
+PROFILE_HEADER = "X-Profile"
+
+# cProfile profiles one request at a time per worker
+profile_lock = threading.Lock()
+
+
+def profile_mode() -> str | None:
+    """
+    "inline" to return the profile instead of the response, "file" to save it
+    to the profile_dir setting, None if profiling is not requested by an
+    authenticated client with X-Profile header or profile query argument,
+    "inline" or one of TRUE_VALUES
+    """
+    mode = request.headers.get(PROFILE_HEADER) or request.args.get("profile")
+    if not mode:
+        return None
+    mode = mode.strip().lower()
+    if mode != "inline" and mode not in TRUE_VALUES:
+        return None
+    if not is_authenticated():
+        return None
+    if mode == "inline" or not get_settings().profile_dir:
+        return "inline"
+    return "file"
+
+
+def stop_profiler():
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        profile_lock.release()
+    return profiler
+
+
+def init_app(app) -> None:
+    @app.before_request
+    def start_profiler():
+        mode = profile_mode()
+        if mode is None or not profile_lock.acquire(blocking=False):
+            return
+
+        g.profile_mode = mode
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+    @app.after_request
+    def save_profile(response):
+        profiler = stop_profiler()
+        if profiler is None:
+            return response
+
+        settings = get_settings()
+        if g.profile_mode == "inline":
+            # the profile replaces the body, not the status of the response
+            stream = io.StringIO()
+            stream.write(f"{request.method} {request.path} {response.status}\n")
+            stats = pstats.Stats(profiler, stream=stream)
+            stats.sort_stats("cumulative").print_stats(settings.profile_inline_limit)
+            return app.response_class(
+                stream.getvalue(), status=response.status_code, mimetype="text/plain"
+            )
+
+        file_name = f"{time.time_ns()}-{request.endpoint}-{os.getpid()}.pstats"
+        os.makedirs(settings.profile_dir, exist_ok=True)
+        profiler.dump_stats(os.path.join(settings.profile_dir, file_name))
+        response.headers[PROFILE_HEADER + "-File"] = file_name
+        return response
+
+    @app.teardown_request
+    def release_profiler(exception):
+        # after_request is skipped for unhandled exceptions
+        stop_profiler()
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import tempfile
+from typing import Callable, Iterable
+
+from flask import current_app
+
+from app.metrics import RESPONSE_CACHE_REQUESTS, endpoint_name, measure
+from app.settings import get_settings
+
+
+class ResponseCache:
+    """
+    Response bodies of immutable commit data in files shared by the
+    workers, least recently used files are removed above `max_size` bytes.
+    Disabled without a directory.
+    """
+
+    def __init__(self, directory: str | None, max_size: int):
+        self.directory = directory
+        self.max_size = max_size
+
+    @property
+    def enabled(self) -> bool:
+        return self.directory is not None and self.max_size > 0
+
+    def path(self, key: tuple) -> str:
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, name + ".json")
+
+    def get(self, key: tuple) -> bytes | None:
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        try:
+            with open(path, "rb") as cache_file:
+                body = cache_file.read()
+            os.utime(path)
+            return body
+        except FileNotFoundError:
+            return None
+
+    def set(self, key: tuple, body: bytes) -> None:
+        if not self.enabled or len(body) > self.max_size:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=self.directory, suffix=".tmp", delete=False
+        ) as cache_file:
+            cache_file.write(body)
+        os.replace(cache_file.name, self.path(key))
+        self.evict()
+
+    def clear(self) -> None:
+        if self.directory is None:
+            return
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name.endswith(".json"):
+                try:
+                    os.unlink(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def evict(self) -> None:
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+def init_app(app) -> None:
+    settings = get_settings()
+    app.extensions["response_cache"] = ResponseCache(
+        settings.response_cache_dir, settings.response_cache_max_size
+    )
+
+
+def cache_json(key: tuple, func: Callable[[], object]) -> bytes:
+    """Serialize `func()` and store it as the response body of `key`"""
+    data = func()
+    with measure("serialize"):
+        body = current_app.json.response(data).get_data()
+    current_app.extensions["response_cache"].set(key, body)
+    return body
+
+
+def cached_json(key: tuple, func: Callable[[], object]):
+    """
+    JSON response of `func()` from the response cache, on a miss identical
+    concurrent requests share the body of a single call
+    """
+    body = current_app.extensions["response_cache"].get(key)
+    RESPONSE_CACHE_REQUESTS.labels(
+        endpoint_name(), "miss" if body is None else "hit"
+    ).inc()
+    if body is None:
+        body = current_app.extensions["single_flight"].do(
+            key, lambda: cache_json(key, func)
+        )
+    return current_app.response_class(body, mimetype="application/json")
+
+
+def cached_bodies(keys: dict, func: Callable[[list], Iterable[tuple]]) -> dict:
+    """
+    Response bodies of several `keys` (name to key) from the response cache,
+    `func(names)` yields (name, data) of the names missing there, each is
+    stored and encoded before the next is made
+    """
+    cache = current_app.extensions["response_cache"]
+    bodies = {}
+    for name, key in keys.items():
+        bodies[name] = cache.get(key)
+        RESPONSE_CACHE_REQUESTS.labels(
+            endpoint_name(), "miss" if bodies[name] is None else "hit"
+        ).inc()
+
+    missing = [name for name, body in bodies.items() if body is None]
+    if missing:
+        for name, data in func(missing):
+            bodies[name] = cache_json(keys[name], lambda: data)
+    return bodies
@@ -0,0 +1,76 @@
+from marshmallow import (
+    EXCLUDE,
+    Schema,
+    ValidationError,
+    fields,
+    validate,
+    validates_schema,
+)
+
+
+class MapFileRequestSchema(Schema):
+    commit_hash = fields.String(required=True)
+    commit_msg = fields.String(required=True)
+    branch_name = fields.String(required=True)
+    bss_size = fields.Integer(required=True)
+    text_size = fields.Integer(required=True)
+    rodata_size = fields.Integer(required=True)
+    data_size = fields.Integer(required=True)
+    free_flash_size = fields.Integer(required=True)
+    pull_id = fields.Integer(required=False)
+    pull_name = fields.String(required=False)
+
+
+class BackfillEntrySchema(MapFileRequestSchema):
+    datetime = fields.DateTime(required=False)
+    map_file = fields.String(required=False)
+    elf_file = fields.String(required=False)
+
+    @validates_schema
+    def validate_build_file(self, data, **kwargs):
+        if "map_file" not in data and "elf_file" not in data:
+            raise ValidationError("map_file or elf_file is required", "map_file")
+
+
+class ExportRequestSchema(Schema):
+    class Meta:
+        # query string also carries arguments of other layers, like profile
+        unknown = EXCLUDE
+
+    format = fields.String(
+        load_default="csv", validate=validate.OneOf(["csv", "parquet"])
+    )
+    header_ids = fields.String(
+        required=False, validate=validate.Regexp(r"^\d+(,\d+)*$")
+    )
+    branch_name = fields.String(required=False)
+    since = fields.DateTime(required=False)
+    until = fields.DateTime(required=False)
+
+    @validates_schema
+    def validate_builds(self, data, **kwargs):
+        if "header_ids" not in data and "branch_name" not in data:
+            raise ValidationError("header_ids or branch_name is required", "header_ids")
+
+
+class SymbolSearchRequestSchema(Schema):
+    class Meta:
+        # query string also carries arguments of other layers, like profile
+        unknown = EXCLUDE
+
+    q = fields.String(required=True, validate=validate.Length(min=1, max=256))
+    mode = fields.String(
+        load_default="substring",
+        validate=validate.OneOf(["prefix", "substring", "fuzzy"]),
+    )
+    kind = fields.String(load_default="name", validate=validate.OneOf(["name", "path"]))
+    branch_name = fields.String(required=False)
+    from_branch_id = fields.Integer(required=False)
+    to_branch_id = fields.Integer(required=False)
+    page = fields.Integer(load_default=1, validate=validate.Range(min=1))
+    per_page = fields.Integer(load_default=50, validate=validate.Range(min=1, max=200))
+
+    @validates_schema
+    def validate_fuzzy_query(self, data, **kwargs):
+        if data.get("mode") == "fuzzy" and len(data.get("q", "")) < 3:
+            raise ValidationError("fuzzy search needs 3 characters", "q")
@@ -0,0 +1,212 @@
+import io
+import struct
+from typing import NamedTuple
+
+from werkzeug.datastructures import FileStorage
+
+from app.metrics import measure, observe_rows
+from app.services.map_file import MapFileError
+from app.services.map_parser import (
+    ParsedData,
+    demangle_parsed_data,
+    write_subsection,
+)
+
+ELF_MAGIC = b"\x7fELF"
+ELFCLASS32 = 1
+ELFCLASS64 = 2
+ELFDATA2MSB = 2
+EM_ARM = 40
+
+SHT_SYMTAB = 2
+SHN_UNDEF = 0
+SHN_LORESERVE = 0xFF00
+
+STT_NOTYPE = 0
+STT_OBJECT = 1
+STT_FUNC = 2
+STT_FILE = 4
+STT_TLS = 6
+STB_LOCAL = 0
+
+SYMBOL_TYPES = (STT_NOTYPE, STT_OBJECT, STT_FUNC, STT_TLS)
+
+
+class ElfFormat:
+    """struct formats for ELF32/ELF64 in given byte order"""
+
+    def __init__(self, elf_class: int, byte_order: str):
+        if elf_class == ELFCLASS64:
+            # e_type .. e_shstrndx
+            self.header = struct.Struct(byte_order + "HHIQQQIHHHHHH")
+            # sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size, sh_link, ...
+            self.section = struct.Struct(byte_order + "IIQQQQIIQQ")
+            # st_name, st_info, st_other, st_shndx, st_value, st_size
+            self.symbol = struct.Struct(byte_order + "IBBHQQ")
+        else:
+            self.header = struct.Struct(byte_order + "HHIIIIIHHHHHH")
+            self.section = struct.Struct(byte_order + "IIIIIIIIII")
+            # st_name, st_value, st_size, st_info, st_other, st_shndx
+            self.symbol = struct.Struct(byte_order + "IIIBBH")
+        self.elf64 = elf_class == ELFCLASS64
+
+
+class ElfSection(NamedTuple):
+    name: str
+    type: int
+    offset: int
+    size: int
+    link: int
+
+
+def read_at(file, offset: int, size: int) -> bytes:
+    file.seek(offset)
+    data = file.read(size)
+    if len(data) != size:
+        raise MapFileError("ELF file is truncated")
+    return data
+
+
+def c_string(table: bytes, offset: int) -> str:
+    end = table.find(b"\0", offset)
+    return table[offset : end if end >= 0 else len(table)].decode(errors="replace")
+
+
+def read_sections(file, elf: ElfFormat) -> tuple[int, list[ElfSection]]:
+    (
+        _,
+        e_machine,
+        _,
+        _,
+        _,
+        e_shoff,
+        _,
+        _,
+        _,
+        _,
+        e_shentsize,
+        e_shnum,
+        e_shstrndx,
+    ) = elf.header.unpack(read_at(file, 16, elf.header.size))
+
+    if e_shentsize < elf.section.size:
+        raise MapFileError(f"ELF section header size {e_shentsize} is invalid")
+    headers = read_at(file, e_shoff, e_shentsize * e_shnum)
+    raw_sections = [
+        elf.section.unpack_from(headers, index * e_shentsize)
+        for index in range(e_shnum)
+    ]
+
+    # sections are unnamed without a section name table
+    names = b""
+    if e_shstrndx != SHN_UNDEF:
+        if e_shstrndx >= e_shnum:
+            raise MapFileError(f"ELF section name table {e_shstrndx} is invalid")
+        shstrtab = raw_sections[e_shstrndx]
+        names = read_at(file, shstrtab[4], shstrtab[5])
+
+    sections = [
+        ElfSection(
+            name=c_string(names, section[0]),
+            type=section[1],
+            offset=section[4],
+            size=section[5],
+            link=section[6],
+        )
+        for section in raw_sections
+    ]
+    return e_machine, sections
+
+
+def read_elf_symbols(file: FileStorage) -> ParsedData:
+    """
+    Read sized symbols from the ELF symbol table into the same rows as
+    `flatten_parsed_data(parse_sections(map_file))`. ELF has no archive and
+    object file names, so lib is empty and obj_name is the source file of
+    local symbols (from STT_FILE entries) and empty for global ones.
+    """
+    if not file.seekable():
+        file = io.BytesIO(file.read())
+
+    ident = read_at(file, 0, 16)
+    if not ident.startswith(ELF_MAGIC):
+        raise MapFileError("Not an ELF file")
+
+    if ident[4] not in (ELFCLASS32, ELFCLASS64):
+        raise MapFileError(f"ELF class {ident[4]} is invalid")
+
+    elf = ElfFormat(ident[4], ">" if ident[5] == ELFDATA2MSB else "<")
+    e_machine, sections = read_sections(file, elf)
+
+    result = ParsedData()
+    symbols = []
+    for symtab in sections:
+        if symtab.type != SHT_SYMTAB:
+            continue
+
+        if symtab.link >= len(sections):
+            raise MapFileError(f"ELF symbol string table {symtab.link} is invalid")
+        if symtab.size % elf.symbol.size:
+            raise MapFileError(f"ELF symbol table size {symtab.size} is invalid")
+        strtab = sections[symtab.link]
+        names = read_at(file, strtab.offset, strtab.size)
+        table = read_at(file, symtab.offset, symtab.size)
+
+        file_name = ""
+        for entry in elf.symbol.iter_unpack(table):
+            if elf.elf64:
+                st_name, st_info, _, st_shndx, st_value, st_size = entry
+            else:
+                st_name, st_value, st_size, st_info, _, st_shndx = entry
+
+            symbol_type = st_info & 0xF
+            if symbol_type == STT_FILE:
+                file_name = c_string(names, st_name)
+                continue
+
+            if (
+                symbol_type not in SYMBOL_TYPES
+                or st_size == 0
+                or st_shndx == SHN_UNDEF
+                or st_shndx >= SHN_LORESERVE
+            ):
+                continue
+            if st_shndx >= len(sections):
+                raise MapFileError(f"ELF symbol section {st_shndx} is invalid")
+
+            # thumb functions have the lowest address bit set
+            if symbol_type == STT_FUNC and e_machine == EM_ARM:
+                st_value &= ~1
+
+            symbols.append(
+                (
+                    st_value,
+                    sections[st_shndx].name,
+                    st_size,
+                    c_string(names, st_name),
+                    file_name if st_info >> 4 == STB_LOCAL else "",
+                )
+            )
+
+    symbols.sort()
+    for address, section_name, size, mangled_name, file_name in symbols:
+        write_subsection(
+            section_name=section_name,
+            subsection_name=section_name,
+            address=address,
+            size=size,
+            module_name="",
+            file_name=file_name,
+            mangled_name=mangled_name,
+            result=result,
+        )
+    return result
+
+
+def parse_elf_symbols(file: FileStorage) -> ParsedData:
+    with measure("parse"):
+        result = read_elf_symbols(file)
+    with measure("demangle"):
+        demangle_parsed_data(result)
+    observe_rows("parse", len(result))
+    return result
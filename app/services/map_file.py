@@ -0,0 +1,83 @@
+import gzip
+import io
+import zlib
+
+import zstandard
+from werkzeug.datastructures import FileStorage
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+DECOMPRESSION_ERRORS = (OSError, EOFError, zlib.error, zstandard.ZstdError)
+
+
+class MapFileError(Exception):
+    pass
+
+
+class MapFileTooLarge(MapFileError):
+    pass
+
+
+class LimitedReader(io.RawIOBase):
+    """Decompressed stream that fails once more than max_size bytes are read"""
+
+    def __init__(self, stream, max_size: int):
+        self.stream = stream
+        self.max_size = max_size
+        self.size = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        try:
+            size = self.stream.readinto(buffer)
+        except DECOMPRESSION_ERRORS as err:
+            raise MapFileError(f"Invalid compressed map file: {err}") from err
+
+        self.size += size
+        if self.size > self.max_size:
+            raise MapFileTooLarge(
+                f"Decompressed map file is larger than {self.max_size} bytes"
+            )
+        return size
+
+
+def detect_encoding(file: FileStorage, content_encoding: str | None) -> str:
+    if content_encoding:
+        return content_encoding.strip().lower()
+
+    stream = getattr(file, "stream", file)
+    if not stream.seekable():
+        return "identity"
+
+    position = stream.tell()
+    magic = stream.read(len(ZSTD_MAGIC))
+    stream.seek(position)
+
+    if magic.startswith(GZIP_MAGIC):
+        return "gzip"
+    if magic.startswith(ZSTD_MAGIC):
+        return "zstd"
+    return "identity"
+
+
+def open_map_file(file: FileStorage, content_encoding: str | None, max_size: int):
+    """
+    Return map file as is or as a streaming decompressor, encoding is taken
+    from Content-Encoding or detected by gzip/zstd magic bytes
+    """
+    encoding = detect_encoding(file, content_encoding)
+    stream = getattr(file, "stream", file)
+
+    if encoding == "identity":
+        return file
+    elif encoding in ("gzip", "x-gzip"):
+        decompressed = gzip.GzipFile(fileobj=stream, mode="rb")
+    elif encoding == "zstd":
+        decompressed = zstandard.ZstdDecompressor().stream_reader(stream)
+    else:
+        raise MapFileError(f"Unsupported content encoding: {encoding}")
+
+    return io.BufferedReader(LimitedReader(decompressed, max_size), 1024 * 1024)
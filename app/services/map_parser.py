@@ -26,14 +26,34 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 
+import codecs
+import io
+import mmap
 import os
 import re
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, NamedTuple
 
-from cxxfilt import demangle
 from werkzeug.datastructures import FileStorage
 
+from app.metrics import measure, observe_rows
+from app.services.map_file import MapFileError
+
+
+class Symbol(NamedTuple):
+    offset: int
+    size: int
+    name: str
+
 
 class ObjectFile:
+    __slots__ = ("section", "offset", "size", "path", "basepath", "children")
+
     def __init__(self, section: str, offset: int, size: int, comment: str):
         self.section = section.strip()
         self.offset = offset
@@ -51,58 +71,78 @@ class ObjectFile:
         return f"<Objectfile {self.section} {self.offset:x} {self.size:x} {self.path} {repr(self.children)}>"
 
 
-def update_children_size(children: list[list], subsection_size: int) -> list:
+def update_children_size(
+    children: list[tuple[int, str]], subsection_size: int
+) -> list[Symbol]:
+    sizes = [0] * len(children)
+
     # set subsection size to an only child
     if len(children) == 1:
-        children[0][1] = subsection_size
-        return children
-
-    rest_size = subsection_size
-
-    for index in range(1, len(children)):
+        sizes[0] = subsection_size
+    else:
+        rest_size = subsection_size
+
+        for index in range(1, len(children)):
+            if rest_size > 0:
+                # current size = current address - previous child address
+                child_size = children[index][0] - children[index - 1][0]
+                rest_size -= child_size
+                sizes[index - 1] = child_size
+
+        # if there is rest size, set it to the last child element
         if rest_size > 0:
-            # current size = current address - previous child address
-            child_size = children[index][0] - children[index - 1][0]
-            rest_size -= child_size
-            children[index - 1][1] = child_size
-
-    # if there is rest size, set it to the last child element
-    if rest_size > 0:
-        children[-1][1] = rest_size
-
-    return children
-
-
-def parse_sections(file: FileStorage) -> list:
-    """
-    Quick&Dirty parsing for GNU ld’s linker map output, needs LANG=C, because
-    some messages are localized.
-    """
-
-    sections = []
-    # skip until memory map is found
-    found = False
-
+            sizes[-1] = rest_size
+
+    return [
+        Symbol(offset, size, name) for (offset, name), size in zip(children, sizes)
+    ]
+
+
+# long section names result in a linebreak afterwards
+sectionre = re.compile(
+    "(?P<section>.+?|.{14,}\n)[ ]+0x(?P<offset>[0-9a-f]+)[ ]+0x(?P<size>[0-9a-f]+)(?:[ ]+(?P<comment>.+))?\n+",
+    re.I,
+)
+subsectionre = re.compile(
+    "[ ]{16}0x(?P<offset>[0-9a-f]+)[ ]+(?P<function>.+)\n+", re.I
+)
+
+# lines the parser always steps onto: the first char is not a space or it is
+# a single space followed by an input section, never a symbol/continuation line
+chunkre = re.compile("^(?:[^ \n]| [^ \n0])", re.M)
+
+# same expressions for the raw upload, CRLF is matched instead of replaced
+sectionre_bytes = re.compile(
+    rb"(?P<section>[^\r\n]+?|[^\r\n]{14,}\r?\n)[ ]+0x(?P<offset>[0-9a-f]+)[ ]+0x(?P<size>[0-9a-f]+)(?:[ ]+(?P<comment>[^\r\n]+))?(?:\r?\n)+",
+    re.I,
+)
+subsectionre_bytes = re.compile(
+    rb"[ ]{16}0x(?P<offset>[0-9a-f]+)[ ]+(?P<function>[^\r\n]+)(?:\r?\n)+", re.I
+)
+memoryre_bytes = re.compile(
+    rb"^[^\S\n]*Memory Configuration[^\S\n]*(?:\n|\Z)", re.M
+)
+
+
+def skip_memory_configuration(file: FileStorage) -> None:
+    """Skip file until memory map is found"""
     while True:
-        line = file.readline().decode().replace("\r", "")
+        line = file.readline().decode(errors="replace").replace("\r", "")
         if not line:
             break
         if line.strip() == "Memory Configuration":
-            found = True
-            break
+            return
 
-    if not found:
-        raise Exception(f"Memory configuration is not found in the {file}")
+    raise MapFileError("Memory configuration is not found in the map file")
 
-    # long section names result in a linebreak afterwards
-    sectionre = re.compile(
-        "(?P<section>.+?|.{14,}\n)[ ]+0x(?P<offset>[0-9a-f]+)[ ]+0x(?P<size>[0-9a-f]+)(?:[ ]+(?P<comment>.+))?\n+",
-        re.I,
-    )
-    subsectionre = re.compile(
-        "[ ]{16}0x(?P<offset>[0-9a-f]+)[ ]+(?P<function>.+)\n+", re.I
-    )
-    s = file.read().decode().replace("\r", "")
+
+def parse_map_text(s: str, sections: list | None = None) -> list:
+    """
+    Parse the part of the map file after "Memory Configuration",
+    subsections found before the first section are added to `sections[-1]`
+    """
+    if sections is None:
+        sections = []
     pos = 0
 
     while True:
@@ -138,7 +178,7 @@ def parse_sections(file: FileStorage) -> list:
                     offset, function = m.groups()
                     offset = int(offset, 16)
                     if sections and sections[-1].children:
-                        children.append([offset, 0, function])
+                        children.append((offset, function))
 
                 if children:
                     children = update_children_size(
@@ -153,6 +193,143 @@ def parse_sections(file: FileStorage) -> list:
     return sections
 
 
+# decoded map text is read and parsed about this many bytes at a time
+MAP_TEXT_BLOCK_SIZE = 1024 * 1024
+
+
+def last_split(s: str) -> int:
+    """Start of the last line of `s` that matches chunkre, 0 if there is none"""
+    pos = s.rfind("\n")
+    while pos >= 0:
+        if chunkre.match(s, pos + 1):
+            return pos + 1
+        pos = s.rfind("\n", 0, pos)
+    return 0
+
+
+def iter_map_text(
+    file: FileStorage, block_size: int = MAP_TEXT_BLOCK_SIZE
+) -> Iterator[str]:
+    """
+    Map text after "Memory Configuration" decoded a block at a time, in parts
+    split at lines the parser always steps onto, so the decompressed file is
+    never held as a whole
+    """
+    skip_memory_configuration(file)
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    while True:
+        block = file.read(block_size)
+        try:
+            pending += decoder.decode(block, final=not block).replace("\r", "")
+        except UnicodeDecodeError as err:
+            raise MapFileError(f"Map file is not UTF-8 text: {err}") from err
+        if not block:
+            break
+        split = last_split(pending)
+        if split:
+            yield pending[:split]
+            pending = pending[split:]
+    if pending:
+        yield pending
+
+
+def parse_sections(file: FileStorage) -> list:
+    """
+    Quick&Dirty parsing for GNU ld’s linker map output, needs LANG=C, because
+    some messages are localized.
+    """
+    sections = []
+    for s in iter_map_text(file):
+        parse_map_text(s, sections)
+    return sections
+
+
+@contextmanager
+def map_file_buffer(file: FileStorage):
+    """
+    Memory-map the map file, uploads that are not backed by
+    a file yet are spooled to a temporary file first
+    """
+    with tempfile.TemporaryFile() as spool:
+        try:
+            fd = file.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            shutil.copyfileobj(file, spool, 1024 * 1024)
+            spool.flush()
+            fd = spool.fileno()
+
+        if os.fstat(fd).st_size == 0:
+            yield b""
+            return
+
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as buf:
+            yield buf
+
+
+def find_memory_configuration(buf) -> int:
+    m = memoryre_bytes.search(buf)
+    if not m:
+        raise MapFileError("Memory configuration is not found in the map file")
+    return m.end()
+
+
+def parse_map_buffer(buf, pos: int = 0) -> list:
+    """
+    Same as `parse_map_text`, but runs over undecoded map file,
+    only captured fields are decoded
+    """
+    sections = []
+
+    while True:
+        m = sectionre_bytes.match(buf, pos)
+        if not m:
+            # skip that line
+            nextpos = buf.find(b"\n", pos)
+            if nextpos == -1:
+                break
+            pos = nextpos + 1
+            continue
+
+        pos = m.end()
+        section = m.group("section").decode()
+        offset = int(m.group("offset"), 16)
+        size = int(m.group("size"), 16)
+        comment = m.group("comment")
+
+        if section != "*default*" and size > 0:
+            of = ObjectFile(section, offset, size, comment and comment.decode())
+            if section.startswith(" "):
+                children = []
+                sections[-1].children.append(of)
+
+                while True:
+                    m = subsectionre_bytes.match(buf, pos)
+                    if not m:
+                        break
+                    pos = m.end()
+                    offset, function = m.groups()
+                    children.append((int(offset, 16), function.decode()))
+
+                if children:
+                    children = update_children_size(
+                        children=children, subsection_size=of.size
+                    )
+
+                sections[-1].children[-1].children.extend(children)
+
+            else:
+                sections.append(of)
+
+    return sections
+
+
+def parse_sections_mmap(file: FileStorage) -> list:
+    """Same as `parse_sections`, but over memory-mapped map file"""
+    with map_file_buffer(file) as buf:
+        return parse_map_buffer(buf, find_memory_configuration(buf))
+
+
 def get_subsection_name(section_name: str, subsection: ObjectFile) -> str:
     subsection_split_names = subsection.section.split(".")
     if subsection.section.startswith("."):
@@ -165,33 +342,77 @@ def get_subsection_name(section_name: str, subsection: ObjectFile) -> str:
     )
 
 
+@dataclass(slots=True)
+class ParsedData:
+    """Flat parsed rows stored column by column"""
+
+    section_name: list[str] = field(default_factory=list)
+    subsection_name: list[str] = field(default_factory=list)
+    address: list[int] = field(default_factory=list)
+    size: list[int] = field(default_factory=list)
+    demangled_name: list[str] = field(default_factory=list)
+    module_name: list[str] = field(default_factory=list)
+    file_name: list[str] = field(default_factory=list)
+    mangled_name: list[str] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.size)
+
+    def extend(self, other: "ParsedData") -> None:
+        self.section_name.extend(other.section_name)
+        self.subsection_name.extend(other.subsection_name)
+        self.address.extend(other.address)
+        self.size.extend(other.size)
+        self.demangled_name.extend(other.demangled_name)
+        self.module_name.extend(other.module_name)
+        self.file_name.extend(other.file_name)
+        self.mangled_name.extend(other.mangled_name)
+
+    def rows(self) -> Iterator[tuple[str, str, int, int, str, str, str, str]]:
+        return zip(
+            self.section_name,
+            self.subsection_name,
+            self.address,
+            self.size,
+            self.demangled_name,
+            self.module_name,
+            self.file_name,
+            self.mangled_name,
+        )
+
+    def data_rows(self) -> Iterator[tuple[str, int, int, str, str, str]]:
+        """(section, address, size, name, lib, obj_name) rows of the data table"""
+        return zip(
+            self.section_name,
+            self.address,
+            self.size,
+            self.demangled_name,
+            self.module_name,
+            self.file_name,
+        )
+
+
 def write_subsection(
     section_name: str,
     subsection_name: str,
-    address: str,
+    address: int,
     size: int,
-    demangled_name: str,
     module_name: str,
     file_name: str,
     mangled_name: str,
-    result_array: list[dict],
+    result: ParsedData,
 ) -> None:
-    result_array.append(
-        {
-            "section_name": section_name,
-            "subsection_name": subsection_name,
-            "address": int(address, 16),
-            "size": size,
-            "demangled_name": demangled_name,
-            "module_name": module_name,
-            "file_name": file_name,
-            "mangled_name": mangled_name,
-        }
-    )
+    result.section_name.append(section_name)
+    result.subsection_name.append(subsection_name)
+    result.address.append(address)
+    result.size.append(size)
+    result.module_name.append(module_name)
+    result.file_name.append(file_name)
+    result.mangled_name.append(mangled_name)
 
 
 def save_subsection(
-    section_name: str, subsection: ObjectFile, result_array: list[dict]
+    section_name: str, subsection: ObjectFile, result: ParsedData
 ) -> None:
     subsection_name = get_subsection_name(section_name, subsection)
     module_name = subsection.path[0]
@@ -201,60 +422,157 @@ def save_subsection(
         file_name, module_name = module_name, ""
 
     if not subsection.children:
-        address = f"{subsection.offset:x}"
-        size = subsection.size
         mangled_name = (
             ""
             if subsection.section == section_name
             else subsection.section.split(".")[-1]
         )
-        demangled_name = demangle(mangled_name) if mangled_name else mangled_name
 
         write_subsection(
             section_name=section_name,
             subsection_name=subsection_name,
-            address=address,
-            size=size,
-            demangled_name=demangled_name,
+            address=subsection.offset,
+            size=subsection.size,
             module_name=module_name,
             file_name=file_name,
             mangled_name=mangled_name,
-            result_array=result_array,
+            result=result,
         )
         return
 
     for subsection_child in subsection.children:
-        address = f"{subsection_child[0]:x}"
-        size = subsection_child[1]
-        mangled_name = subsection_child[2]
-        demangled_name = demangle(mangled_name)
-
         write_subsection(
             section_name=section_name,
             subsection_name=subsection_name,
-            address=address,
-            size=size,
-            demangled_name=demangled_name,
+            address=subsection_child.offset,
+            size=subsection_child.size,
             module_name=module_name,
             file_name=file_name,
-            mangled_name=mangled_name,
-            result_array=result_array,
+            mangled_name=subsection_child.name,
+            result=result,
         )
 
 
-def save_section(section: ObjectFile, result_array: list) -> None:
+def save_section(section: ObjectFile, result: ParsedData) -> None:
     section_name = section.section
     for subsection in section.children:
         save_subsection(
             section_name=section_name,
             subsection=subsection,
-            result_array=result_array,
+            result=result,
         )
 
 
-def save_parsed_data(parsed_data: list[ObjectFile]) -> list[dict]:
-    result_array = []
+def flatten_parsed_data(parsed_data: list[ObjectFile]) -> ParsedData:
+    """Flatten parsed sections into rows with mangled names only"""
+    result = ParsedData()
     for section in parsed_data:
         if section.children:
-            save_section(section=section, result_array=result_array)
-    return result_array
+            save_section(section=section, result=result)
+    return result
+
+
+def demangle_parsed_data(result: ParsedData) -> ParsedData:
+    # cxxfilt loads libstdc++ with ctypes, only when a map file is parsed
+    from cxxfilt import demangle
+
+    result.demangled_name = [
+        demangle(mangled_name) if mangled_name else mangled_name
+        for mangled_name in result.mangled_name
+    ]
+    return result
+
+
+def save_parsed_data(parsed_data: list[ObjectFile]) -> ParsedData:
+    return demangle_parsed_data(flatten_parsed_data(parsed_data))
+
+
+def split_map_text(s: str, chunks: int) -> list[tuple[str, str | None]]:
+    """
+    Split map text into about `chunks` parts, preferably at output sections.
+    Big output sections are split at their input sections, so every part is
+    returned with the name of the section its leading subsections belong to.
+    """
+    target = len(s) // chunks + 1
+    parts = []
+    start = 0
+    start_parent = parent = None
+
+    for m in chunkre.finditer(s):
+        pos = m.start()
+        if pos - start >= target:
+            parts.append((s[start:pos], start_parent))
+            start, start_parent = pos, parent
+        parent = section_parent(s, pos, parent)
+
+    parts.append((s[start:], start_parent))
+    return parts
+
+
+def section_parent(s: str, pos: int, parent: str | None) -> str | None:
+    """Output section starting at `pos` of map text, `parent` otherwise"""
+    if s[pos] != " ":
+        section = sectionre.match(s, pos)
+        if (
+            section
+            and section.group("section") != "*default*"
+            and int(section.group("size"), 16) > 0
+        ):
+            return section.group("section").strip()
+    return parent
+
+
+def map_text_chunks(file: FileStorage) -> Iterator[tuple[str, str | None]]:
+    """Parts of `iter_map_text` with the section their leading subsections are in"""
+    parent = None
+    for s in iter_map_text(file):
+        yield s, parent
+        for m in chunkre.finditer(s):
+            parent = section_parent(s, m.start(), parent)
+
+
+def parse_map_chunk(chunk: tuple[str, str | None]) -> ParsedData:
+    s, parent = chunk
+    sections = [] if parent is None else [ObjectFile(parent, 0, 0, "")]
+    return save_parsed_data(parse_map_text(s, sections))
+
+
+def parse_map_file_parallel(file: FileStorage, workers: int) -> ParsedData:
+    """
+    Same as `save_parsed_data(parse_sections(file))`, but chunks of the map
+    file are parsed and demangled in a process pool and merged in order
+    """
+    result = ParsedData()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # map text is read while chunks are parsed, at most two per process wait
+        parsing = deque()
+        for chunk in map_text_chunks(file):
+            if len(parsing) >= workers * 2:
+                result.extend(parsing.popleft().result())
+            parsing.append(executor.submit(parse_map_chunk, chunk))
+        while parsing:
+            result.extend(parsing.popleft().result())
+    return result
+
+
+def parse_map_file(
+    file: FileStorage, workers: int = 1, use_mmap: bool = False
+) -> ParsedData:
+    """
+    Parse map file into flat rows, in a process pool if workers > 1,
+    otherwise in the current thread over memory-mapped file if use_mmap
+    """
+    if workers > 1:
+        with measure("parse"):
+            result = parse_map_file_parallel(file, workers)
+        observe_rows("parse", len(result))
+        return result
+
+    with measure("parse"):
+        sections = parse_sections_mmap(file) if use_mmap else parse_sections(file)
+    with measure("flatten"):
+        result = flatten_parsed_data(sections)
+    with measure("demangle"):
+        demangle_parsed_data(result)
+    observe_rows("parse", len(result))
+    return result
@@ -1,13 +1,135 @@
 import os
-from pydantic import BaseModel
+import tempfile
+import types
+from dataclasses import dataclass, fields
+from functools import cache
+from typing import get_args
 
+TRUE_VALUES = ("1", "true", "yes", "on", "t", "y")
+INGEST_PROFILES = ("all", "archive", "hot")
+DIFF_MODES = ("hash", "merge")
+SQLITE_JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+SQLITE_SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
 
-class Settings(BaseModel):
+
+@dataclass(frozen=True)
+class Settings:
     database_uri: str
     auth_token: str
+    database_replica_uri: str | None = None
+    database_pool_size: int | None = None
+    database_max_overflow: int | None = None
+    database_pool_timeout: int | None = None
+    database_pool_recycle: int | None = None
+    database_pool_pre_ping: bool = False
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout: int = 30_000
+    sqlite_cache_size: int = 64 * 1024
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    map_parser_workers: int = 1
+    map_parser_mmap: bool = False
+    map_file_max_size: int = 512 * 1024 * 1024
+    profile_dir: str | None = None
+    profile_inline_limit: int = 100
+    single_flight_dir: str | None = None
+    single_flight_ttl: int = 5
+    admission_dir: str = os.path.join(
+        tempfile.gettempdir(), "firmware-report-server-admission"
+    )
+    admission_aggregate_limit: int = 2
+    admission_upload_limit: int = 1
+    admission_export_limit: int = 1
+    admission_events_limit: int = 2
+    admission_queue: int = 8
+    admission_timeout: int = 10
+    admission_retry_after: int = 5
+    threads: int = 8
+    response_cache_dir: str | None = None
+    response_cache_max_size: int = 256 * 1024 * 1024
+    prewarm_branches: str = "main,release"
+    events_dir: str = os.path.join(
+        tempfile.gettempdir(), "firmware-report-server-events"
+    )
+    events_keepalive: int = 15
+    events_stream_timeout: int = 300
+    ingest_profile: str = "archive"
+    diff_mode: str = "hash"
+
+    def __post_init__(self):
+        # environment values are strings, convert them to the field types
+        for field in fields(self):
+            value = getattr(self, field.name)
+            field_type = field.type
+            if isinstance(field_type, types.UnionType):
+                field_type = get_args(field_type)[0]
+
+            if value is None:
+                if field.default is not None:
+                    raise ValueError(f"{field.name.upper()} is not set")
+            elif field_type is int:
+                object.__setattr__(self, field.name, int(value))
+            elif field_type is bool and isinstance(value, str):
+                object.__setattr__(self, field.name, value.lower() in TRUE_VALUES)
+
+        if self.ingest_profile not in INGEST_PROFILES:
+            raise ValueError(
+                f"INGEST_PROFILE must be one of {', '.join(INGEST_PROFILES)}"
+            )
+        if self.diff_mode not in DIFF_MODES:
+            raise ValueError(f"DIFF_MODE must be one of {', '.join(DIFF_MODES)}")
+        for name, modes in [
+            ("sqlite_journal_mode", SQLITE_JOURNAL_MODES),
+            ("sqlite_synchronous", SQLITE_SYNCHRONOUS_MODES),
+        ]:
+            # pragma values are written into the statements
+            value = getattr(self, name).upper()
+            if value not in modes:
+                raise ValueError(f"{name.upper()} must be one of {', '.join(modes)}")
+            object.__setattr__(self, name, value)
 
 
-settings = Settings(
-    database_uri=os.environ.get("DATABASE_URI"),
-    auth_token=os.environ.get("AUTH_TOKEN"),
-)
+@cache
+def get_settings() -> Settings:
+    """Settings from environment variables, read on first use"""
+    return Settings(
+        database_uri=os.environ.get("DATABASE_URI"),
+        auth_token=os.environ.get("AUTH_TOKEN"),
+        database_replica_uri=os.environ.get("DATABASE_REPLICA_URI"),
+        database_pool_size=os.environ.get("DATABASE_POOL_SIZE"),
+        database_max_overflow=os.environ.get("DATABASE_MAX_OVERFLOW"),
+        database_pool_timeout=os.environ.get("DATABASE_POOL_TIMEOUT"),
+        database_pool_recycle=os.environ.get("DATABASE_POOL_RECYCLE"),
+        database_pool_pre_ping=os.environ.get("DATABASE_POOL_PRE_PING", False),
+        sqlite_journal_mode=os.environ.get("SQLITE_JOURNAL_MODE", "WAL"),
+        sqlite_synchronous=os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+        sqlite_busy_timeout=os.environ.get("SQLITE_BUSY_TIMEOUT", 30_000),
+        sqlite_cache_size=os.environ.get("SQLITE_CACHE_SIZE", 64 * 1024),
+        sqlite_mmap_size=os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024),
+        map_parser_workers=os.environ.get("MAP_PARSER_WORKERS", 1),
+        map_parser_mmap=os.environ.get("MAP_PARSER_MMAP", False),
+        map_file_max_size=os.environ.get("MAP_FILE_MAX_SIZE", 512 * 1024 * 1024),
+        profile_dir=os.environ.get("PROFILE_DIR"),
+        profile_inline_limit=os.environ.get("PROFILE_INLINE_LIMIT", 100),
+        single_flight_dir=os.environ.get("SINGLE_FLIGHT_DIR"),
+        single_flight_ttl=os.environ.get("SINGLE_FLIGHT_TTL", 5),
+        admission_dir=os.environ.get("ADMISSION_DIR", Settings.admission_dir),
+        admission_aggregate_limit=os.environ.get("ADMISSION_AGGREGATE_LIMIT", 2),
+        admission_upload_limit=os.environ.get("ADMISSION_UPLOAD_LIMIT", 1),
+        admission_export_limit=os.environ.get("ADMISSION_EXPORT_LIMIT", 1),
+        admission_events_limit=os.environ.get("ADMISSION_EVENTS_LIMIT", 2),
+        admission_queue=os.environ.get("ADMISSION_QUEUE", 8),
+        admission_timeout=os.environ.get("ADMISSION_TIMEOUT", 10),
+        admission_retry_after=os.environ.get("ADMISSION_RETRY_AFTER", 5),
+        threads=os.environ.get("THREADS", 8),
+        response_cache_dir=os.environ.get("RESPONSE_CACHE_DIR"),
+        response_cache_max_size=os.environ.get(
+            "RESPONSE_CACHE_MAX_SIZE", 256 * 1024 * 1024
+        ),
+        prewarm_branches=os.environ.get("PREWARM_BRANCHES", "main,release"),
+        events_dir=os.environ.get("EVENTS_DIR", Settings.events_dir),
+        events_keepalive=os.environ.get("EVENTS_KEEPALIVE", 15),
+        events_stream_timeout=os.environ.get("EVENTS_STREAM_TIMEOUT", 300),
+        ingest_profile=os.environ.get("INGEST_PROFILE", "archive"),
+        diff_mode=os.environ.get("DIFF_MODE", "hash"),
+    )
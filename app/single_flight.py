@@ -0,0 +1,133 @@
+import fcntl
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from typing import Callable
+
+from app.metrics import COALESCED_REQUESTS, endpoint_name
+from app.settings import get_settings
+
+
+class Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share one computation: the first
+    caller computes, the others wait for its result. With `directory` set
+    the first callers of every worker also take a file lock on the key and
+    the result is left in the directory for `ttl` seconds, so workers
+    waiting on the lock read it instead of computing again. Every key has
+    its own lock file, removed with the results once unused for `ttl`.
+    """
+
+    def __init__(self, directory: str | None = None, ttl: float = 5):
+        self.directory = directory
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.flights: dict[tuple, Flight] = {}
+
+    def do(self, key: tuple, func: Callable[[], bytes]) -> bytes:
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+
+        if not leader:
+            COALESCED_REQUESTS.labels(endpoint_name(), "thread").inc()
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            if self.directory:
+                flight.result = self.do_locked(key, func)
+            else:
+                flight.result = func()
+            return flight.result
+        except BaseException as err:
+            flight.error = err
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+    def do_locked(self, key: tuple, func: Callable[[], bytes]) -> bytes:
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        result_path = os.path.join(self.directory, name + ".result")
+        os.makedirs(self.directory, exist_ok=True)
+
+        lock_path = os.path.join(self.directory, name + ".lock")
+        with open(lock_path, "wb") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                result = self.read_result(result_path)
+                if result is not None:
+                    COALESCED_REQUESTS.labels(endpoint_name(), "worker").inc()
+                    return result
+
+                result = func()
+                self.remove_expired()
+                with tempfile.NamedTemporaryFile(
+                    dir=self.directory, suffix=".tmp", delete=False
+                ) as result_file:
+                    result_file.write(result)
+                os.replace(result_file.name, result_path)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def read_result(self, path: str) -> bytes | None:
+        try:
+            with open(path, "rb") as result_file:
+                if time.time() - os.fstat(result_file.fileno()).st_mtime > self.ttl:
+                    return None
+                return result_file.read()
+        except FileNotFoundError:
+            return None
+
+    def remove_expired(self) -> None:
+        expired = time.time() - self.ttl
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.stat().st_mtime >= expired:
+                        continue
+                    if entry.name.endswith(".result"):
+                        os.unlink(entry.path)
+                    elif entry.name.endswith(".lock"):
+                        self.remove_unused_lock(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    @staticmethod
+    def remove_unused_lock(path: str) -> None:
+        """
+        Remove a lock file nobody holds, a caller that opened it just before
+        computes without sharing its result, which is only a missed flight
+        """
+        with open(path, "rb") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            os.unlink(path)
+
+
+def init_app(app) -> None:
+    settings = get_settings()
+    app.extensions["single_flight"] = SingleFlight(
+        settings.single_flight_dir, settings.single_flight_ttl
+    )
+
@@ -0,0 +1,265 @@
+import hashlib
+import math
+from typing import Iterable
+
+from sqlalchemy import func, insert, select
+
+SYMBOL_KINDS = ("name", "path")
+SEARCH_MODES = ("prefix", "substring", "fuzzy")
+# matching symbols ranked before scoping them to builds
+MAX_CANDIDATES = 1000
+# trigram similarity of fuzzy matches
+FUZZY_THRESHOLD = 0.3
+LOOKUP_CHUNK = 500
+
+
+def trigrams(value: str) -> set[str]:
+    value = value.lower()
+    return {value[index : index + 3] for index in range(len(value) - 2)}
+
+
+def symbol_hash(kind: str, value: str) -> str:
+    return hashlib.sha1(f"{kind}\0{value}".encode()).hexdigest()
+
+
+def chunks(values: list, size: int = LOOKUP_CHUNK) -> Iterable[list]:
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def insert_ignore(model):
+    """Insert skipping rows of existing keys, another worker may add them"""
+    # core insert of the table, rows are not ORM objects
+    return (
+        insert(model.__table__)
+        .prefix_with("IGNORE", dialect="mysql")
+        .prefix_with("OR IGNORE", dialect="sqlite")
+    )
+
+
+def index_symbols(executor, rows: list[dict]) -> int:
+    """
+    Add names and paths of data rows missing in the symbol dictionary and
+    their trigrams, with a session or connection. Returns added symbols.
+    """
+    from app.app import Symbol, SymbolTrigram
+
+    values = {("name", row["name"]) for row in rows if row["name"]}
+    values |= {("path", row["path"]) for row in rows if row["path"]}
+    symbols = {symbol_hash(kind, value): (kind, value) for kind, value in values}
+
+    existing = set()
+    for chunk in chunks(list(symbols)):
+        existing.update(
+            executor.execute(
+                select(Symbol.value_hash).where(Symbol.value_hash.in_(chunk))
+            ).scalars()
+        )
+    new_symbols = {
+        value_hash: symbol
+        for value_hash, symbol in symbols.items()
+        if value_hash not in existing
+    }
+    if not new_symbols:
+        return 0
+
+    executor.execute(
+        insert_ignore(Symbol),
+        [
+            {"kind": kind, "value": value, "value_hash": value_hash}
+            for value_hash, (kind, value) in new_symbols.items()
+        ],
+    )
+    ids = {}
+    for chunk in chunks(list(new_symbols)):
+        ids.update(
+            executor.execute(
+                select(Symbol.value_hash, Symbol.id).where(
+                    Symbol.value_hash.in_(chunk)
+                )
+            ).all()
+        )
+    trigram_rows = [
+        {"trigram": trigram, "symbol_id": ids[value_hash]}
+        for value_hash, (_, value) in new_symbols.items()
+        for trigram in trigrams(value)
+    ]
+    if trigram_rows:
+        executor.execute(insert_ignore(SymbolTrigram), trigram_rows)
+    return len(new_symbols)
+
+
+def in_builds(
+    query,
+    branch_name: str | None,
+    from_branch_id: int | None,
+    to_branch_id: int | None,
+):
+    """`query` of data rows restricted to the searched rows and builds"""
+    from app.app import INTERESTING_SECTIONS, Data, Header
+
+    query = query.where(Data.section.in_(INTERESTING_SECTIONS)).where(Data.size > 0)
+    if branch_name is not None:
+        query = query.join(Header, Data.header_id == Header.id).where(
+            Header.branch_name == branch_name
+        )
+    if from_branch_id is not None:
+        query = query.where(Data.header_id >= from_branch_id)
+    if to_branch_id is not None:
+        query = query.where(Data.header_id <= to_branch_id)
+    return query
+
+
+def sharing_trigrams(query: str, min_shared: int):
+    """Ids of symbols sharing at least `min_shared` trigrams of `query`"""
+    from app.app import SymbolTrigram
+
+    return (
+        select(SymbolTrigram.symbol_id)
+        .where(SymbolTrigram.trigram.in_(trigrams(query)))
+        .group_by(SymbolTrigram.symbol_id)
+        .having(func.count(SymbolTrigram.trigram) >= min_shared)
+    )
+
+
+def limited(rows: list) -> tuple[list, bool]:
+    """First MAX_CANDIDATES of `rows` fetched with one more to tell there are more"""
+    return rows[:MAX_CANDIDATES], len(rows) > MAX_CANDIDATES
+
+
+def match_symbols(
+    session, kind: str, query: str, mode: str, in_scope
+) -> tuple[list[tuple], bool]:
+    """
+    (score, value) of symbols matching `query` and `in_scope`, best first,
+    and whether more than MAX_CANDIDATES of them matched. Matching, scoping
+    and ranking run in the database, so the limit keeps the best matches.
+    """
+    from app.app import Symbol, SymbolTrigram
+
+    candidates = select(Symbol.value).where(Symbol.kind == kind).where(in_scope)
+    if mode == "prefix":
+        values, truncated = limited(
+            session.scalars(
+                candidates.where(Symbol.value.startswith(query, autoescape=True))
+                .order_by(Symbol.value)
+                .limit(MAX_CANDIDATES + 1)
+            ).all()
+        )
+        matches = [(1.0, value) for value in values]
+    elif mode == "substring":
+        candidates = candidates.where(
+            func.lower(Symbol.value).contains(query.lower(), autoescape=True)
+        )
+        query_trigrams = trigrams(query)
+        if query_trigrams:
+            candidates = candidates.where(
+                Symbol.id.in_(sharing_trigrams(query, len(query_trigrams)))
+            )
+        # otherwise shorter than a trigram, the dictionary is scanned
+        values, truncated = limited(
+            session.scalars(
+                candidates.order_by(func.length(Symbol.value), Symbol.value).limit(
+                    MAX_CANDIDATES + 1
+                )
+            ).all()
+        )
+        matches = [(len(query) / len(value), value) for value in values]
+    else:
+        query_trigrams = trigrams(query)
+        min_shared = max(1, math.ceil(len(query_trigrams) * FUZZY_THRESHOLD))
+        shared = func.count(SymbolTrigram.trigram)
+        rows, truncated = limited(
+            session.execute(
+                candidates.add_columns(shared)
+                .join(SymbolTrigram, SymbolTrigram.symbol_id == Symbol.id)
+                .where(SymbolTrigram.trigram.in_(query_trigrams))
+                .group_by(Symbol.id, Symbol.value)
+                .having(shared >= min_shared)
+                .order_by(shared.desc(), Symbol.value)
+                .limit(MAX_CANDIDATES + 1)
+            ).all()
+        )
+        matches = []
+        for value, shared_count in rows:
+            total = len(query_trigrams) + len(trigrams(value)) - shared_count
+            if shared_count / total >= FUZZY_THRESHOLD:
+                matches.append((shared_count / total, value))
+
+    return sorted(matches, key=lambda match: (-match[0], match[1])), truncated
+
+
+def search_symbols(
+    session,
+    query: str,
+    mode: str = "substring",
+    kind: str = "name",
+    branch_name: str | None = None,
+    from_branch_id: int | None = None,
+    to_branch_id: int | None = None,
+    page: int = 1,
+    per_page: int = 50,
+) -> dict:
+    """
+    Symbol names or object paths matching `query` in the builds of the
+    branch and header id range, with their first and last build. `total`
+    counts at most MAX_CANDIDATES matches, `truncated` tells there are more.
+    """
+    from app.app import Data, Header, Symbol
+
+    column = Data.name if kind == "name" else Data.path
+    scope = (branch_name, from_branch_id, to_branch_id)
+    in_scope = in_builds(select(Data.id).where(column == Symbol.value), *scope)
+    matches, truncated = match_symbols(session, kind, query, mode, in_scope.exists())
+    page_matches = matches[(page - 1) * per_page : page * per_page]
+
+    builds = {}
+    if page_matches:
+        counts = in_builds(
+            select(
+                column,
+                func.count(func.distinct(Data.header_id)),
+                func.min(Data.header_id),
+                func.max(Data.header_id),
+            ).where(column.in_([value for _, value in page_matches])),
+            *scope,
+        ).group_by(column)
+        for value, count, first_id, last_id in session.execute(counts):
+            builds[value] = (count, first_id, last_id)
+
+    header_ids = {
+        header_id
+        for _, value in page_matches
+        for header_id in builds[value][1:]
+    }
+    headers = {
+        header.id: header
+        for header in session.scalars(select(Header).where(Header.id.in_(header_ids)))
+    }
+
+    def build(header_id: int) -> dict:
+        header = headers[header_id]
+        return {
+            "branch_id": header.id,
+            "commit": header.commit,
+            "branch_name": header.branch_name,
+            "datetime": header.datetime,
+        }
+
+    return {
+        "total": len(matches),
+        "truncated": truncated,
+        "page": page,
+        "per_page": per_page,
+        "results": [
+            {
+                "kind": kind,
+                "value": value,
+                "score": round(score, 3),
+                "builds": builds[value][0],
+                "first": build(builds[value][1]),
+                "last": build(builds[value][2]),
+            }
+            for score, value in page_matches
+        ],
+    }
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+# Compare ELF symbol table ingestion with map file parsing of the same build.
+# Without --elf-file the ELF is synthesized from the map file symbols.
+#
+#   python -m benchmarks.elf_vs_map [--map-file firmware.elf.map] [--elf-file firmware.elf]
+
+import argparse
+import io
+import time
+
+from app.services.elf_parser import parse_elf_symbols
+from app.services.map_parser import parse_sections, save_parsed_data
+from tests.source.elf_writer import elf_symbols_from_rows, write_elf
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--map-file", default="tests/assets/firmware.elf.map")
+    parser.add_argument("--elf-file", help="ELF file of the same build")
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+def best_of(repeat: int, func, data: bytes):
+    best = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = func(io.BytesIO(data))
+        total_time = time.perf_counter() - start_time
+        best = total_time if best is None else min(best, total_time)
+    return best, result
+
+
+def main():
+    args = parse_args()
+    with open(args.map_file, "rb") as map_file:
+        map_data = map_file.read()
+
+    if args.elf_file:
+        with open(args.elf_file, "rb") as elf_file:
+            elf_data = elf_file.read()
+    else:
+        parsed_data = save_parsed_data(parse_sections(io.BytesIO(map_data)))
+        elf_file = io.BytesIO()
+        write_elf(elf_symbols_from_rows(parsed_data.data_rows()), elf_file)
+        elf_data = elf_file.getvalue()
+
+    map_time, map_rows = best_of(
+        args.repeat, lambda file: save_parsed_data(parse_sections(file)), map_data
+    )
+    elf_time, elf_rows = best_of(args.repeat, parse_elf_symbols, elf_data)
+
+    print(f"{'source':<10}{'bytes':>12}{'rows':>10}{'seconds':>10}{'rows/s':>12}")
+    for name, size, rows, seconds in (
+        ("map", len(map_data), len(map_rows), map_time),
+        ("elf", len(elf_data), len(elf_rows), elf_time),
+    ):
+        print(f"{name:<10}{size:>12}{rows:>10}{seconds:>10.3f}{rows / seconds:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
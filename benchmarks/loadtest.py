@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+
+# Offline API load test against a seeded SQLite database.
+#
+# Seed thousands of synthetic dev, release and user branch builds:
+#   python -m benchmarks.loadtest seed --database /tmp/loadtest.db --builds 2000
+#
+# Replay a request mix in-process through the Flask app:
+#   python -m benchmarks.loadtest run --database /tmp/loadtest.db --concurrency 8 --duration 30
+#
+# or against a running server using the same database:
+#   DATABASE_URI=sqlite:////tmp/loadtest.db AUTH_TOKEN=loadtest gunicorn -w 4 -b 127.0.0.1:6754 "app:create_app()"
+#   python -m benchmarks.loadtest run --database /tmp/loadtest.db --url http://127.0.0.1:6754
+
+import argparse
+import io
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from app.app import Data, Header, create_app, db, flipper_path
+from app.services.map_parser import parse_map_file
+
+AUTH_TOKEN = "loadtest"
+
+DEFAULT_MIX = "branches=15,branch=25,brief=25,full=5,diff=25,analyse=5"
+
+MAP_FORM = {
+    "commit_msg": "load test",
+    "bss_size": "8200",
+    "text_size": "547708",
+    "rodata_size": "146240",
+    "data_size": "1568",
+    "free_flash_size": "352720",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    seed = subparsers.add_parser("seed", help="Create and fill the database")
+    seed.add_argument("--database", required=True, help="SQLite database file")
+    seed.add_argument("--builds", type=int, default=2000)
+    seed.add_argument("--rows", type=int, default=2000, help="Data rows per build")
+    seed.add_argument("--map-file", default="tests/assets/firmware.elf.map")
+    seed.add_argument("--seed", type=int, default=0)
+
+    run = subparsers.add_parser("run", help="Replay the request mix")
+    run.add_argument("--database", required=True, help="Seeded SQLite database file")
+    run.add_argument("--url", help="Server to load, in-process Flask app if not set")
+    run.add_argument("--concurrency", type=int, default=4)
+    run.add_argument("--duration", type=float, default=30, help="Seconds")
+    run.add_argument("--mix", default=DEFAULT_MIX, help="Request weights")
+    run.add_argument("--map-file", default="tests/assets/firmware.elf.map")
+    run.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def load_app(database: str):
+    # settings are read on first use
+    os.environ["DATABASE_URI"] = f"sqlite:///{os.path.abspath(database)}"
+    os.environ.setdefault("AUTH_TOKEN", AUTH_TOKEN)
+    return create_app()
+
+
+def branch_names(builds: int, rng: random.Random) -> list[str]:
+    """Branch of every build: mostly dev, some releases and user branches"""
+    names = []
+    release = 0
+    for _ in range(builds):
+        kind = rng.random()
+        if kind < 0.6:
+            names.append("dev")
+        elif kind < 0.7:
+            release += 1
+            suffix = "-rc" if rng.random() < 0.5 else ""
+            names.append(f"0.{release // 2}.{release % 2}{suffix}")
+        else:
+            names.append(f"user{rng.randrange(50)}/feature-{rng.randrange(200)}")
+    return names
+
+
+def seed_database(args) -> None:
+    app = load_app(args.database)
+
+    rng = random.Random(args.seed)
+    with open(args.map_file, "rb") as map_file:
+        parsed_data = parse_map_file(map_file)
+    base_rows = list(parsed_data.data_rows())
+    base_rows = rng.sample(base_rows, min(args.rows, len(base_rows)))
+    paths = {
+        (lib, obj_name): flipper_path(lib, obj_name)
+        for *_, lib, obj_name in base_rows
+    }
+
+    start_time = time.perf_counter()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        connection = db.session.connection()
+
+        build_time = datetime(2023, 1, 1)
+        for header_id, branch_name in enumerate(
+            branch_names(args.builds, rng), start=1
+        ):
+            build_time += timedelta(minutes=rng.randrange(5, 240))
+            connection.execute(
+                Header.__table__.insert(),
+                {
+                    "id": header_id,
+                    "datetime": build_time,
+                    "commit": uuid.UUID(int=rng.getrandbits(128)).hex,
+                    "commit_msg": f"build {header_id}",
+                    "branch_name": branch_name,
+                    "bss_size": 8200,
+                    "text_size": 547708,
+                    "rodata_size": 146240,
+                    "data_size": 1568,
+                    "free_flash_size": 352720,
+                    "pullrequest_id": header_id if "/" in branch_name else None,
+                    "pullrequest_name": branch_name if "/" in branch_name else None,
+                },
+            )
+            # every build changes a few symbols of the previous one
+            for index in rng.sample(range(len(base_rows)), len(base_rows) // 50):
+                section, address, size, *names = base_rows[index]
+                size = max(size + rng.randint(-16, 32), 0)
+                base_rows[index] = (section, address, size, *names)
+
+            connection.execute(
+                Data.__table__.insert(),
+                [
+                    {
+                        "header_id": header_id,
+                        "section": section,
+                        "address": address,
+                        "size": size,
+                        "name": name,
+                        "lib": lib,
+                        "obj_name": obj_name,
+                        "path": paths[lib, obj_name],
+                    }
+                    for section, address, size, name, lib, obj_name in base_rows
+                ],
+            )
+        db.session.commit()
+
+    total_time = time.perf_counter() - start_time
+    print(
+        f"Seeded {args.builds} builds, {args.builds * len(base_rows)} rows "
+        f"into {args.database} in {total_time:.1f}s"
+    )
+
+
+def read_targets(database: str) -> tuple[list[int], list[int], list[str]]:
+    """Dev header ids, all header ids and branch names of the seeded database"""
+    with sqlite3.connect(database) as connection:
+        headers = connection.execute(
+            "SELECT id, branch_name FROM header ORDER BY datetime"
+        ).fetchall()
+    dev_ids = [header_id for header_id, branch in headers if branch == "dev"]
+    all_ids = [header_id for header_id, _ in headers]
+    branches = sorted({branch for _, branch in headers if branch != "dev"})
+    return dev_ids, all_ids, branches
+
+
+class Client:
+    """Same requests through the Flask test client or over HTTP"""
+
+    def __init__(self, url: str | None, app):
+        self.url = url
+        self.client = None if url else app.test_client()
+
+    def get(self, path: str) -> int:
+        if self.client:
+            return self.client.get(path).status_code
+        try:
+            with urllib.request.urlopen(self.url + path) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as err:
+            return err.code
+
+    def post_map_file(self, path: str, form: dict, map_data: bytes) -> int:
+        token = os.environ.get("AUTH_TOKEN", AUTH_TOKEN)
+        headers = {"Authorization": f"Bearer {token}"}
+        if self.client:
+            data = form | {"map_file": (io.BytesIO(map_data), "firmware.elf.map")}
+            return self.client.post(path, data=data, headers=headers).status_code
+
+        boundary = uuid.uuid4().hex
+        body = b"".join(
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n".encode()
+            for name, value in form.items()
+        )
+        body += (
+            f'--{boundary}\r\nContent-Disposition: form-data; name="map_file"; '
+            f'filename="firmware.elf.map"\r\n\r\n'
+        ).encode()
+        body += map_data + f"\r\n--{boundary}--\r\n".encode()
+        request = urllib.request.Request(
+            self.url + path,
+            data=body,
+            headers=headers
+            | {"Content-Type": f"multipart/form-data; boundary={boundary}"},
+        )
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as err:
+            return err.code
+
+
+def make_request(kind: str, client: Client, rng: random.Random, targets, map_data):
+    dev_ids, all_ids, branches = targets
+    if kind == "branches":
+        return client.get("/api/v0/branches")
+    if kind == "branch":
+        branch = "dev" if rng.random() < 0.3 or not branches else rng.choice(branches)
+        return client.get(f"/api/v0/branch?branch_name={branch}")
+    if kind == "brief":
+        return client.get(f"/api/v0/commit_brief_data?branch_id={rng.choice(all_ids)}")
+    if kind == "full":
+        return client.get(f"/api/v0/commit_full_data?branch_id={rng.choice(all_ids)}")
+    if kind == "diff":
+        return client.get(
+            "/api/v0/commit_diff_data"
+            f"?branch_ids={rng.choice(all_ids)},{rng.choice(dev_ids)}"
+        )
+    if kind == "analyse":
+        form = MAP_FORM | {
+            "commit_hash": uuid.UUID(int=rng.getrandbits(128)).hex,
+            "branch_name": rng.choice(["dev", *branches[:5]]),
+        }
+        return client.post_map_file("/api/v0/map-file/analyse", form, map_data)
+    raise ValueError(f"Unknown request {kind}")
+
+
+def percentile(values: list[float], percent: float) -> float:
+    index = max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+def run_load(args) -> None:
+    app = None
+    if not args.url:
+        app = load_app(args.database)
+
+    targets = read_targets(args.database)
+    if not targets[1]:
+        sys.exit(f"{args.database} is empty, run seed first")
+
+    mix = [item.split("=") for item in args.mix.split(",")]
+    kinds = [kind for kind, _ in mix]
+    weights = [float(weight) for _, weight in mix]
+
+    with open(args.map_file, "rb") as map_file:
+        map_data = map_file.read()
+
+    latencies = {kind: [] for kind in kinds}
+    errors = {kind: 0 for kind in kinds}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def worker(index: int) -> None:
+        rng = random.Random(args.seed + index)
+        client = Client(args.url, app)
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            start_time = time.perf_counter()
+            status = make_request(kind, client, rng, targets, map_data)
+            latency = time.perf_counter() - start_time
+            with lock:
+                latencies[kind].append(latency)
+                if status >= 400:
+                    errors[kind] += 1
+
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(worker, range(args.concurrency)))
+    total_time = time.perf_counter() - start_time
+
+    print(
+        f"{'endpoint':<10}{'requests':>10}{'errors':>8}{'req/s':>8}"
+        f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    )
+    total = 0
+    for kind in kinds:
+        values = sorted(latencies[kind])
+        total += len(values)
+        if not values:
+            continue
+        print(
+            f"{kind:<10}{len(values):>10}{errors[kind]:>8}"
+            f"{len(values) / total_time:>8.1f}"
+            f"{percentile(values, 50) * 1000:>10.1f}"
+            f"{percentile(values, 95) * 1000:>10.1f}"
+            f"{percentile(values, 99) * 1000:>10.1f}"
+        )
+    print(
+        f"\n{total} requests in {total_time:.1f}s, {total / total_time:.1f} req/s, "
+        f"concurrency {args.concurrency}"
+    )
+
+
+def main():
+    args = parse_args()
+    if args.command == "seed":
+        seed_database(args)
+    else:
+        run_load(args)
+
+
+if __name__ == "__main__":
+    main()
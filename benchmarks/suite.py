@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+# Throughput and peak memory of the parser and aggregation stages on
+# tests/assets/firmware.elf.map and on synthetically scaled copies of it.
+# Results are written as JSON, --compare prints the change against
+# results of another commit.
+#
+#   python -m benchmarks.suite [--scales 1,10,100] [--compare benchmarks/results/<commit>.json]
+
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime
+
+from flask import Flask
+
+from app.app import (
+    INTERESTING_SECTIONS,
+    DiffHashData,
+    Files,
+    HashData,
+    Sections,
+    flipper_path,
+)
+from app.services.map_parser import (
+    demangle_parsed_data,
+    flatten_parsed_data,
+    parse_sections,
+)
+
+MEMORY_CONFIGURATION = b"Memory Configuration"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--map-file", default="tests/assets/firmware.elf.map")
+    parser.add_argument("--scales", default="1,10", help="Comma separated scales")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Results file, benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", help="Results file to compare with")
+    return parser.parse_args()
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def scale_map_file(map_data: bytes, scale: int) -> bytes:
+    """Repeat everything after Memory Configuration `scale` times"""
+    position = map_data.index(MEMORY_CONFIGURATION) + len(MEMORY_CONFIGURATION)
+    return map_data[:position] + map_data[position:] * scale
+
+
+def data_rows(parsed_data, scale: int, variant: int = 0) -> list[dict]:
+    """
+    Rows as returned by get_commits_by_branch_id, every copy gets its own
+    object files and symbol names. Variant 1 is a changed build for diffs:
+    some sizes grow, some symbols are removed.
+    """
+    rows = []
+    for copy in range(scale):
+        for index, (section, address, size, name, lib, obj_name) in enumerate(
+            parsed_data.data_rows()
+        ):
+            if section not in INTERESTING_SECTIONS or size <= 0:
+                continue
+            if variant and index % 11 == 0:
+                continue
+            if variant and index % 7 == 0:
+                size += 4
+            if copy:
+                obj_name = f"{copy}/{obj_name}"
+            rows.append(
+                {
+                    "header_id": variant,
+                    "id": len(rows),
+                    "section": section,
+                    "address": str(address),
+                    "size": size,
+                    "name": f"{name}.{copy}" if copy else name,
+                    "lib": lib,
+                    "obj_name": obj_name,
+                    "path": flipper_path(lib, obj_name),
+                }
+            )
+    return rows
+
+
+def measure(repeat: int, setup, func):
+    """Best time of `repeat` runs and peak traced memory of a separate run"""
+    best = None
+    for _ in range(repeat):
+        argument = setup()
+        start_time = time.perf_counter()
+        result = func(argument)
+        total_time = time.perf_counter() - start_time
+        best = total_time if best is None else min(best, total_time)
+        del argument, result
+
+    argument = setup()
+    tracemalloc.start()
+    result = func(argument)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
+
+
+def run_scale(map_data: bytes, scale: int, repeat: int) -> list[dict]:
+    scaled_map = scale_map_file(map_data, scale)
+    results = []
+
+    def record(benchmark: str, rows: int, seconds: float, peak: int) -> None:
+        results.append(
+            {
+                "benchmark": benchmark,
+                "scale": scale,
+                "rows": rows,
+                "seconds": round(seconds, 6),
+                "rows_per_second": round(rows / seconds) if seconds else None,
+                "peak_bytes": peak,
+            }
+        )
+        print(
+            f"{benchmark:<20}{scale:>6}{rows:>10}{seconds:>10.3f}"
+            f"{rows / seconds if seconds else 0:>12.0f}{peak / 2**20:>10.1f}"
+        )
+
+    seconds, peak, sections = measure(
+        repeat, lambda: io.BytesIO(scaled_map), parse_sections
+    )
+    flat_seconds, flat_peak, parsed_data = measure(
+        repeat, lambda: sections, flatten_parsed_data
+    )
+    record("parse_sections", len(parsed_data), seconds, peak)
+    record("save_parsed_data", len(parsed_data), flat_seconds, flat_peak)
+
+    seconds, peak, _ = measure(
+        repeat, lambda: flatten_parsed_data(sections), demangle_parsed_data
+    )
+    record("demangle", len(parsed_data), seconds, peak)
+    del sections
+
+    parsed_data = flatten_parsed_data(parse_sections(io.BytesIO(map_data)))
+    demangle_parsed_data(parsed_data)
+    current = data_rows(parsed_data, scale)
+    previous = data_rows(parsed_data, scale, variant=1)
+
+    seconds, peak, hash_current = measure(repeat, lambda: current, HashData)
+    record("HashData", len(current), seconds, peak)
+
+    seconds, peak, diff = measure(
+        repeat,
+        lambda: (HashData(current), HashData(previous)),
+        lambda hashes: DiffHashData(*hashes),
+    )
+    record("DiffHashData", len(current) + len(previous), seconds, peak)
+
+    seconds, peak, sections = measure(repeat, lambda: current, Sections)
+    record("Sections", len(current), seconds, peak)
+
+    seconds, peak, files = measure(repeat, lambda: current, Files)
+    record("Files", len(current), seconds, peak)
+
+    response = {"sections": sections.get_sections(), "files": files.get_files()}
+    app = Flask(__name__)
+    seconds, peak, body = measure(repeat, lambda: response, app.json.dumps)
+    record("serialize", len(current), seconds, peak)
+
+    return results
+
+
+def compare(results: list[dict], previous_file: str) -> None:
+    with open(previous_file) as file:
+        previous = {
+            (result["benchmark"], result["scale"]): result
+            for result in json.load(file)["results"]
+        }
+
+    print(f"\n{'benchmark':<20}{'scale':>6}{'time':>10}{'memory':>10}")
+    for result in results:
+        old = previous.get((result["benchmark"], result["scale"]))
+        if old is None:
+            continue
+        time_change = result["seconds"] / old["seconds"] - 1 if old["seconds"] else 0
+        memory_change = (
+            result["peak_bytes"] / old["peak_bytes"] - 1 if old["peak_bytes"] else 0
+        )
+        print(
+            f"{result['benchmark']:<20}{result['scale']:>6}"
+            f"{time_change:>+10.1%}{memory_change:>+10.1%}"
+        )
+
+
+def main():
+    args = parse_args()
+    with open(args.map_file, "rb") as map_file:
+        map_data = map_file.read()
+
+    print(
+        f"{'benchmark':<20}{'scale':>6}{'rows':>10}{'seconds':>10}"
+        f"{'rows/s':>12}{'peak MiB':>10}"
+    )
+    results = []
+    for scale in (int(scale) for scale in args.scales.split(",")):
+        results.extend(run_scale(map_data, scale, args.repeat))
+
+    commit = git_commit()
+    output = args.output or os.path.join("benchmarks", "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(
+            {
+                "commit": commit,
+                "datetime": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "map_file": args.map_file,
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+    print(f"\nResults are saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
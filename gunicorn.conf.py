@@ -0,0 +1,21 @@
+import os
+import shutil
+import tempfile
+
+# prometheus_client keeps metrics of every worker in this directory,
+# /metrics aggregates them over all workers
+prometheus_multiproc_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "firmware-report-server-metrics"),
+)
+
+
+def on_starting(server):
+    shutil.rmtree(prometheus_multiproc_dir, ignore_errors=True)
+    os.makedirs(prometheus_multiproc_dir)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -2,21 +2,82 @@ import os
 
 import pytest
 
-from app.app import app, db
+from app import admission
+from app.app import create_app, db
+from app.settings import get_settings
 
 
 @pytest.fixture(scope="session")
 def cli():
+    app = create_app()
     client = app.test_client()
     client.environ_base["HTTP_AUTHORIZATION"] = "Bearer " + os.getenv("APP_AUTH_TOKEN")
 
     with app.app_context():
-        db.drop_all()
-        db.create_all()
+        db.drop_all(bind_key=None)
+        db.create_all(bind_key=None)
 
     return client
 
 
+@pytest.fixture
+def sqlite_app(tmp_path, monkeypatch):
+    """
+    Application with an empty SQLite database and response cache, uploads are
+    not prewarmed, tests call prewarm_commit_data
+    """
+    monkeypatch.setenv("DATABASE_URI", f"sqlite:///{tmp_path / 'report.db'}")
+    monkeypatch.setenv("AUTH_TOKEN", "token")
+    monkeypatch.setenv("RESPONSE_CACHE_DIR", str(tmp_path / "responses"))
+    monkeypatch.setenv("ADMISSION_DIR", str(tmp_path / "admission"))
+    monkeypatch.setenv("EVENTS_DIR", str(tmp_path / "events"))
+    monkeypatch.setenv("PREWARM_BRANCHES", "")
+    get_settings.cache_clear()
+    admission.lanes.clear()
+    admission.thread_budget.cache_clear()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all(bind_key=None)
+    yield app
+
+    app.extensions["prewarm"].shutdown(wait=True)
+    get_settings.cache_clear()
+    admission.lanes.clear()
+    admission.thread_budget.cache_clear()
+
+
+MAP_FORM = {
+    "commit_msg": "",
+    "bss_size": 0,
+    "text_size": 0,
+    "rodata_size": 0,
+    "data_size": 0,
+    "free_flash_size": 0,
+}
+
+
+@pytest.fixture
+def upload_map_file():
+    """Upload tests/assets/firmware.elf.map as a build of the commit and branch"""
+
+    def upload(client, commit_hash: str, branch_name: str):
+        with open("tests/assets/firmware.elf.map", "rb") as map_file:
+            response = client.post(
+                "/api/v0/map-file/analyse",
+                headers={"Authorization": "Bearer token"},
+                data=MAP_FORM
+                | {
+                    "commit_hash": commit_hash,
+                    "branch_name": branch_name,
+                    "map_file": map_file,
+                },
+            )
+        assert response.status_code == 200
+
+    return upload
+
+
 @pytest.fixture(scope="class")
 def prepare_input_map_file_data():
     data = {
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+# Writes a minimal little-endian ELF32 (ARM) with section headers and
+# a symbol table only, used to test and benchmark ELF symbol ingestion
+# against the firmware map file when the firmware ELF is not available.
+
+import re
+import struct
+import sys
+
+SHT_SYMTAB = 2
+SHT_STRTAB = 3
+SHT_NOBITS = 8
+STT_OBJECT = 1
+STT_FUNC = 2
+STT_FILE = 4
+SHN_ABS = 0xFFF1
+EM_ARM = 40
+
+SYMBOL_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_.$]*$")
+
+
+class StringTable:
+    def __init__(self):
+        self.data = bytearray(b"\0")
+        self.offsets = {"": 0}
+
+    def add(self, name: str) -> int:
+        if name not in self.offsets:
+            self.offsets[name] = len(self.data)
+            self.data += name.encode() + b"\0"
+        return self.offsets[name]
+
+
+def elf_symbols_from_rows(rows) -> dict[str, list[tuple[str, str, int, int]]]:
+    """
+    Group (section, address, size, name, lib, obj_name) rows with sized,
+    unique symbol names by object file, like local symbols of an ELF
+    """
+    files = {}
+    seen = set()
+    for section, address, size, name, _, obj_name in rows:
+        if size <= 0 or not SYMBOL_NAME.match(name) or name in seen:
+            continue
+        seen.add(name)
+        files.setdefault(obj_name, []).append((section, name, address, size))
+    return files
+
+
+def write_elf(files: dict[str, list[tuple[str, str, int, int]]], output) -> None:
+    shstrtab = StringTable()
+    strtab = StringTable()
+
+    section_names = []
+    for symbols in files.values():
+        for section, *_ in symbols:
+            if section not in section_names:
+                section_names.append(section)
+    section_index = {name: index + 1 for index, name in enumerate(section_names)}
+
+    symtab = bytearray(struct.pack("<IIIBBH", 0, 0, 0, 0, 0, 0))
+    for obj_name, symbols in files.items():
+        symtab += struct.pack(
+            "<IIIBBH", strtab.add(obj_name), 0, 0, STT_FILE, 0, SHN_ABS
+        )
+        for section, name, address, size in symbols:
+            symbol_type = STT_FUNC if section == ".text" else STT_OBJECT
+            value = address | 1 if symbol_type == STT_FUNC else address
+            symtab += struct.pack(
+                "<IIIBBH",
+                strtab.add(name),
+                value,
+                size,
+                symbol_type,
+                0,
+                section_index[section],
+            )
+
+    # sh_name, sh_type, sh_flags, sh_addr, sh_offset, sh_size, sh_link, sh_info, sh_addralign, sh_entsize
+    headers = [(0,) * 10]
+    for name in section_names:
+        headers.append((shstrtab.add(name), SHT_NOBITS, 0, 0, 0, 0, 0, 0, 4, 0))
+
+    symtab_index = len(headers)
+    data_offset = 52
+    symtab_offset = data_offset
+    strtab_offset = symtab_offset + len(symtab)
+    shstrtab_offset = strtab_offset + len(strtab.data)
+
+    headers.append(
+        (
+            shstrtab.add(".symtab"),
+            SHT_SYMTAB,
+            0,
+            0,
+            symtab_offset,
+            len(symtab),
+            symtab_index + 1,
+            len(symtab) // 16,
+            4,
+            16,
+        )
+    )
+    strtab_name = shstrtab.add(".strtab")
+    headers.append(
+        (strtab_name, SHT_STRTAB, 0, 0, strtab_offset, len(strtab.data), 0, 0, 1, 0)
+    )
+    shstrtab_name = shstrtab.add(".shstrtab")
+    shstrtab_size = len(shstrtab.data)
+    headers.append(
+        (shstrtab_name, SHT_STRTAB, 0, 0, shstrtab_offset, shstrtab_size, 0, 0, 1, 0)
+    )
+    shoff = shstrtab_offset + shstrtab_size
+
+    output.write(b"\x7fELF\x01\x01\x01" + b"\0" * 9)
+    output.write(
+        struct.pack(
+            "<HHIIIIIHHHHHH",
+            2,
+            EM_ARM,
+            1,
+            0,
+            0,
+            shoff,
+            0,
+            52,
+            0,
+            0,
+            40,
+            len(headers),
+            len(headers) - 1,
+        )
+    )
+    output.write(symtab)
+    output.write(strtab.data)
+    output.write(shstrtab.data)
+    for header in headers:
+        output.write(struct.pack("<IIIIIIIIII", *header))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        raise Exception(f"Usage: {sys.argv[0]} <map file> <output elf file>")
+
+    from app.services.map_parser import parse_map_file
+
+    with open(sys.argv[1], "rb") as map_file:
+        parsed_data = parse_map_file(map_file)
+
+    with open(sys.argv[2], "wb") as elf_file:
+        write_elf(elf_symbols_from_rows(parsed_data.data_rows()), elf_file)
@@ -0,0 +1,119 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app import admission
+from app.admission import AdmissionRejected, Lane
+from app.settings import get_settings
+
+
+class TestAdmissionLane:
+    def test_saturated_lane_rejects(self, tmp_path):
+        """
+        Test that a request waits for a busy slot until the timeout (503)
+        and a request finding the wait queue full is rejected at once (429)
+
+        Returns:
+            Nothing
+        """
+        lane = Lane("aggregate", limit=1, queue=1, timeout=1, directory=str(tmp_path))
+        running = threading.Event()
+        release = threading.Event()
+
+        def hold_slot():
+            with lane.slot():
+                running.set()
+                release.wait(5)
+
+        def enter():
+            with lane.slot():
+                pass
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            holder = executor.submit(hold_slot)
+            running.wait(5)
+            waiting = executor.submit(enter)
+
+            # let the second request take the only queue slot
+            time.sleep(0.2)
+            with pytest.raises(AdmissionRejected) as rejected:
+                enter()
+            assert rejected.value.status == 429
+
+            with pytest.raises(AdmissionRejected) as rejected:
+                waiting.result(5)
+            assert rejected.value.status == 503
+
+            release.set()
+            holder.result(5)
+
+        enter()
+
+    def test_waiting_request_gets_released_slot(self, tmp_path):
+        """
+        Test that a waiting request runs as soon as the slot is released
+
+        Returns:
+            Nothing
+        """
+        lane = Lane("upload", limit=1, queue=1, timeout=5, directory=str(tmp_path))
+        running = threading.Event()
+        release = threading.Event()
+
+        def hold_slot():
+            with lane.slot():
+                running.set()
+                release.wait(5)
+
+        def enter():
+            with lane.slot():
+                return "done"
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            holder = executor.submit(hold_slot)
+            running.wait(5)
+            waiting = executor.submit(enter)
+            release.set()
+
+            holder.result(5)
+            assert waiting.result(5) == "done"
+
+    def test_full_thread_budget_leaves_ping(self, sqlite_app, monkeypatch):
+        """
+        Test that with every lane thread of the worker taken an aggregate
+        request is rejected at once instead of waiting on a thread, and ping
+        still answers
+
+        Returns:
+            Nothing
+        """
+        monkeypatch.setenv("THREADS", "3")
+        get_settings.cache_clear()
+        admission.thread_budget.cache_clear()
+        running = threading.Barrier(3)
+        release = threading.Event()
+
+        def hold_slot():
+            with sqlite_app.app_context(), admission.get_lane("aggregate").slot():
+                running.wait(5)
+                release.wait(5)
+
+        client = sqlite_app.test_client()
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            holders = [executor.submit(hold_slot) for _ in range(2)]
+            running.wait(5)
+
+            start_time = time.perf_counter()
+            response = client.get("/api/v0/commit_brief_data?branch_id=1")
+            assert response.status_code == 503
+            assert response.json["details"] == "All worker threads are busy"
+            assert time.perf_counter() - start_time < 1
+            assert client.get("/api/v0/ping").status_code == 200
+
+            release.set()
+            for holder in holders:
+                holder.result(5)
+
+        assert client.get("/api/v0/commit_brief_data?branch_id=1").status_code == 200
@@ -0,0 +1,111 @@
+import json
+import shutil
+
+from app.app import Data, Header, db
+
+
+def write_manifest(tmp_path, commits: list[str]) -> str:
+    manifest = tmp_path / "manifest.jsonl"
+    with open(manifest, "w") as manifest_file:
+        for commit in commits:
+            shutil.copy("tests/assets/firmware.elf.map", tmp_path / f"{commit}.map")
+            entry = {
+                "commit_hash": commit,
+                "commit_msg": "",
+                "branch_name": "dev",
+                "bss_size": 0,
+                "text_size": 0,
+                "rodata_size": 0,
+                "data_size": 0,
+                "free_flash_size": 0,
+                "datetime": "2023-01-01T10:00:00",
+                "map_file": f"{commit}.map",
+            }
+            manifest_file.write(json.dumps(entry) + "\n")
+    return str(manifest)
+
+
+class TestBackfill:
+    def test_backfill_resumes(self, sqlite_app, tmp_path):
+        """
+        Test that backfill inserts every build of the manifest, skips builds
+        recorded in the progress file on a rerun and replaces existing builds
+        with --replace
+
+        Returns:
+            Nothing
+        """
+        runner = sqlite_app.test_cli_runner()
+        manifest = write_manifest(tmp_path, ["first", "second", "third"])
+
+        result = runner.invoke(
+            args=["backfill", manifest, "-j", "2", "--db-jobs", "1"]
+            + ["--batch-size", "2"]
+        )
+        assert result.exit_code == 0, result.output
+        assert "Inserted 3 builds" in result.output
+
+        with sqlite_app.app_context():
+            headers = Header.query.order_by(Header.id).all()
+            assert [header.commit for header in headers] == ["first", "second", "third"]
+            rows = Data.query.filter_by(header_id=headers[0].id).count()
+            assert rows > 0
+            assert Data.query.count() == 3 * rows
+
+        result = runner.invoke(args=["backfill", manifest, "-j", "1"])
+        assert result.exit_code == 0, result.output
+        assert "0 builds to insert, 3 done before" in result.output
+
+        progress = str(tmp_path / "replace.progress")
+        result = runner.invoke(
+            args=["backfill", manifest, "-j", "1", "--replace", "--progress", progress]
+        )
+        assert result.exit_code == 0, result.output
+        with sqlite_app.app_context():
+            assert Header.query.count() == 3
+            assert Data.query.count() == 3 * rows
+            db.session.remove()
+
+    def test_backfill_skips_duplicate_builds(self, sqlite_app, tmp_path):
+        """
+        Test that a build listed twice in the manifest is inserted once
+
+        Returns:
+            Nothing
+        """
+        runner = sqlite_app.test_cli_runner()
+        manifest = write_manifest(tmp_path, ["first", "second", "first"])
+
+        result = runner.invoke(args=["backfill", manifest, "-j", "2", "--db-jobs", "2"])
+        assert result.exit_code == 0, result.output
+        assert "duplicate build, skipped" in result.output
+        assert "Inserted 2 builds" in result.output
+
+        with sqlite_app.app_context():
+            headers = Header.query.order_by(Header.id).all()
+            assert [header.commit for header in headers] == ["first", "second"]
+            db.session.remove()
+
+    def test_backfill_skips_unparsable_builds(self, sqlite_app, tmp_path):
+        """
+        Test that a manifest entry that is not a map file is reported and
+        skipped, the other builds are inserted and recorded as done
+
+        Returns:
+            Nothing
+        """
+        runner = sqlite_app.test_cli_runner()
+        manifest = write_manifest(tmp_path, ["broken", "good"])
+        (tmp_path / "broken.map").write_bytes(b"\x7fELF\x00\xff not a map file\n")
+
+        result = runner.invoke(args=["backfill", manifest, "-j", "1"])
+        assert result.exit_code == 0, result.output
+        assert "Memory configuration is not found" in result.output
+        assert "Inserted 1 builds" in result.output
+        assert "1 failed" in result.output
+
+        with sqlite_app.app_context():
+            assert [header.commit for header in Header.query.all()] == ["good"]
+            db.session.remove()
+        progress = (tmp_path / "manifest.jsonl.progress").read_text().split()
+        assert [path.rsplit("/", 1)[-1] for path in progress] == ["good.map"]
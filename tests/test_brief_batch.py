@@ -0,0 +1,77 @@
+import json
+
+from app.app import Data, commit_brief_data, db
+
+
+class TestBriefDataBatch:
+    def test_batch_equals_brief_data(self, sqlite_app, upload_map_file):
+        """
+        Test that batch brief data has the brief data of every commit, from
+        the response cache where stored, and stores the other commits there
+
+        Returns:
+            Nothing
+        """
+        client = sqlite_app.test_client()
+        upload_map_file(client, "first", "feature")
+        upload_map_file(client, "second", "feature")
+
+        first = client.get("/api/v0/commit_brief_data?branch_id=1").json
+        with sqlite_app.app_context():
+            # stored response of the first commit is not queried again
+            Data.query.filter_by(header_id=1).delete()
+            db.session.commit()
+
+        response = client.get("/api/v0/commit_brief_data_batch?branch_ids=2,1,99")
+        assert response.status_code == 200
+        batch = response.json
+        assert list(batch) == ["2", "1", "99"]
+        assert batch["1"] == first
+        assert batch["2"]["sections"]
+        assert batch["99"] == {"sections": {}, "files": {}}
+
+        with sqlite_app.app_context():
+            Data.query.filter_by(header_id=2).delete()
+            db.session.commit()
+        second = client.get("/api/v0/commit_brief_data?branch_id=2").json
+        assert second == batch["2"]
+
+    def test_batch_streams_builds(self, sqlite_app, upload_map_file, monkeypatch):
+        """
+        Test that builds read in partitions spanning several builds are
+        aggregated like single brief data
+
+        Returns:
+            Nothing
+        """
+        monkeypatch.setattr("app.app.BRIEF_BATCH_ROWS", 7)
+        client = sqlite_app.test_client()
+        for commit in ["first", "second", "third"]:
+            upload_map_file(client, commit, "feature")
+
+        response = client.get("/api/v0/commit_brief_data_batch?branch_ids=3,1,2")
+        assert response.status_code == 200
+        batch = response.json
+        assert list(batch) == ["3", "1", "2"]
+
+        with sqlite_app.test_request_context():
+            expected = json.loads(json.dumps(commit_brief_data(1)))
+        assert expected["sections"]
+        assert batch == {"1": expected, "2": expected, "3": expected}
+
+    def test_invalid_batch_request(self, sqlite_app):
+        """
+        Test that missing, duplicate and too many ids are rejected
+
+        Returns:
+            Nothing
+        """
+        client = sqlite_app.test_client()
+        for query in [
+            "",
+            "branch_ids=1,x",
+            "branch_ids=1,1",
+            "branch_ids=" + ",".join(str(i) for i in range(1, 18)),
+        ]:
+            response = client.get(f"/api/v0/commit_brief_data_batch?{query}")
+            assert response.status_code == 400
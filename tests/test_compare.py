@@ -0,0 +1,56 @@
+from app.app import Data, db
+
+
+class TestCompareData:
+    def test_sizes_are_aligned_with_builds(self, sqlite_app, upload_map_file):
+        """
+        Test that compare data has section and object sizes of every build
+        equal to their brief data and deltas against the baseline build
+
+        Returns:
+            Nothing
+        """
+        client = sqlite_app.test_client()
+        upload_map_file(client, "first", "dev")
+        upload_map_file(client, "second", "dev")
+
+        with sqlite_app.app_context():
+            row = Data.query.filter_by(header_id=2, section=".text").first()
+            row.size += 100
+            path = row.path
+            db.session.commit()
+
+        response = client.get("/api/v0/commit_compare_data?branch_ids=2,1&baseline=1")
+        assert response.status_code == 200
+        compare = response.json
+        assert [build["commit"] for build in compare["builds"]] == ["second", "first"]
+
+        brief = client.get("/api/v0/commit_brief_data?branch_id=1").json
+        assert compare["sections"].keys() == brief["sections"].keys()
+        for name, section in compare["sections"].items():
+            assert section["sizes"][1] == brief["sections"][name]["size"]
+            for obj_name, obj in section["objects"].items():
+                objects = brief["sections"][name]["objects"]
+                assert obj["sizes"][1] == objects[obj_name]["size"]
+
+        text = compare["sections"][".text"]
+        assert text["deltas"] == [100, 0]
+        assert text["objects"][path]["deltas"] == [100, 0]
+        assert compare["sections"][".data"]["deltas"] == [0, 0]
+
+    def test_invalid_compare_request(self, sqlite_app):
+        """
+        Test that duplicate ids and a baseline out of branch_ids are rejected
+
+        Returns:
+            Nothing
+        """
+        client = sqlite_app.test_client()
+        for query in [
+            "",
+            "branch_ids=1,x",
+            "branch_ids=1,1",
+            "branch_ids=1,2&baseline=3",
+        ]:
+            response = client.get(f"/api/v0/commit_compare_data?{query}")
+            assert response.status_code == 400
@@ -0,0 +1,186 @@
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.app import Data, Header, create_app, db
+from app.settings import get_settings
+
+
+@pytest.fixture
+def replica_app(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URI", f"sqlite:///{tmp_path / 'primary.db'}")
+    monkeypatch.setenv("DATABASE_REPLICA_URI", f"sqlite:///{tmp_path / 'replica.db'}")
+    monkeypatch.setenv("AUTH_TOKEN", "token")
+    monkeypatch.setenv("RESPONSE_CACHE_DIR", str(tmp_path / "responses"))
+    monkeypatch.setenv("PREWARM_BRANCHES", "")
+    get_settings.cache_clear()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all(bind_key=None)
+        db.metadata.create_all(db.engines["replica"])
+    yield app
+
+    app.extensions["prewarm"].shutdown(wait=True)
+    get_settings.cache_clear()
+
+
+class TestReplicaRouting:
+    def test_get_requests_read_replica(self, replica_app):
+        """
+        Test that GET endpoints query the replica and uploads
+        are written to the primary database
+
+        Returns:
+            Nothing
+        """
+        with replica_app.app_context():
+            db.session.execute(
+                Header.__table__.insert().values(
+                    commit="replica",
+                    commit_msg="",
+                    branch_name="replica-branch",
+                    bss_size=0,
+                    text_size=0,
+                    rodata_size=0,
+                    data_size=0,
+                    free_flash_size=0,
+                ),
+                bind_arguments={"bind": db.engines["replica"]},
+            )
+            db.session.commit()
+
+        client = replica_app.test_client()
+        response = client.get("/api/v0/branches")
+        assert response.json["misc_branches"] == [
+            {"branch_name": "replica-branch", "count": 1}
+        ]
+
+        with open("tests/assets/firmware.elf.map", "rb") as map_file:
+            response = client.post(
+                "/api/v0/map-file/analyse",
+                headers={"Authorization": "Bearer token"},
+                data={
+                    "commit_hash": "primary",
+                    "commit_msg": "",
+                    "branch_name": "dev",
+                    "bss_size": 0,
+                    "text_size": 0,
+                    "rodata_size": 0,
+                    "data_size": 0,
+                    "free_flash_size": 0,
+                    "map_file": map_file,
+                },
+            )
+        assert response.status_code == 200
+
+        with replica_app.app_context():
+            assert [header.commit for header in Header.query.all()] == ["primary"]
+
+
+class TestPathColumn:
+    def test_paths_of_existing_rows(self, sqlite_app, upload_map_file):
+        """
+        Test that create-tables adds the path column to a table created
+        without it, backfill-paths stores the paths of its rows and the full
+        data of a path prefix returns only rows under it
+
+        Returns:
+            Nothing
+        """
+        upload_map_file(sqlite_app.test_client(), "before", "dev")
+        with sqlite_app.app_context():
+            expected = {
+                row.id: row.path for row in Data.query.order_by(Data.id).all()
+            }
+            db.session.execute(text("DROP INDEX ix_data_header_id_path"))
+            db.session.execute(text("DROP INDEX ix_data_path"))
+            db.session.execute(text("ALTER TABLE data DROP COLUMN path"))
+            db.session.commit()
+
+        runner = sqlite_app.test_cli_runner()
+        result = runner.invoke(args=["create-tables"])
+        assert "ALTER TABLE data ADD COLUMN path TEXT" in result.output
+        assert "CREATE INDEX ix_data_path ON data (path)" in result.output
+        assert "Added column data.path" in result.output
+        result = runner.invoke(args=["backfill-paths"])
+        assert result.exit_code == 0, result.output
+
+        with sqlite_app.app_context():
+            rows = Data.query.order_by(Data.id).all()
+            assert {row.id: row.path for row in rows} == expected
+            db.session.remove()
+
+        response = sqlite_app.test_client().get(
+            "/api/v0/commit_full_data?branch_id=1&path=lib/"
+        )
+        paths = {row["path"] for row in response.json}
+        assert paths and all(path.startswith("lib/") for path in paths)
+
+    def test_long_paths_fit_mysql_columns(self):
+        """
+        Test that path is as long as obj_name on MySQL, with its indexes on
+        a prefix of it
+
+        Returns:
+            Nothing
+        """
+        dialect = mysql.dialect()
+        table = str(CreateTable(Data.__table__).compile(dialect=dialect))
+        assert "path TEXT" in table
+        indexes = {
+            index.name: str(CreateIndex(index).compile(dialect=dialect))
+            for index in Data.__table__.indexes
+        }
+        assert indexes["ix_data_path"].endswith("(path(255))")
+        assert indexes["ix_data_header_id_path"].endswith("(header_id, path(255))")
+
+
+class TestSQLite:
+    def test_connections_are_tuned(self, sqlite_app):
+        """
+        Test that SQLite connections use WAL with the configured pragmas
+
+        Returns:
+            Nothing
+        """
+        with sqlite_app.app_context():
+            pragmas = {
+                name: db.session.execute(text(f"PRAGMA {name}")).scalar()
+                for name in ["journal_mode", "synchronous", "busy_timeout"]
+            }
+        assert pragmas == {
+            "journal_mode": "wal",
+            "synchronous": 1,
+            "busy_timeout": 30_000,
+        }
+
+    def test_upload_waits_for_write_lock(self, sqlite_app, upload_map_file):
+        """
+        Test that an upload waits for the write lock held by another process
+        instead of failing with database is locked
+
+        Returns:
+            Nothing
+        """
+        with sqlite_app.app_context():
+            database = db.engine.url.database
+
+        holder = sqlite3.connect(
+            database, isolation_level=None, check_same_thread=False
+        )
+        holder.execute("BEGIN IMMEDIATE")
+        release = threading.Timer(1, holder.commit)
+        release.start()
+        try:
+            upload_map_file(sqlite_app.test_client(), "waiting", "dev")
+        finally:
+            release.join()
+            holder.close()
+
+        with sqlite_app.app_context():
+            assert Header.query.filter_by(commit="waiting").count() == 1
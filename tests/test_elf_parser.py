@@ -0,0 +1,80 @@
+import io
+import struct
+
+import pytest
+
+from app.services.elf_parser import parse_elf_symbols
+from app.services.map_parser import parse_sections, save_parsed_data
+from tests.source.elf_writer import elf_symbols_from_rows, write_elf
+
+
+class TestElfParser:
+    def test_elf_symbols_match_map_file(self):
+        """
+        Test that symbols read from an ELF symbol table, built from
+        the map file symbols, give the same rows as the map file parser
+
+        Returns:
+            Nothing
+        """
+        with open("tests/assets/firmware.elf.map", "rb") as map_file:
+            parsed_data = save_parsed_data(parse_sections(map_file))
+
+        files = elf_symbols_from_rows(parsed_data.data_rows())
+        elf_file = io.BytesIO()
+        write_elf(files, elf_file)
+        elf_file.seek(0)
+
+        expected = sorted(
+            (section, address, size, name, "", obj_name)
+            for obj_name, symbols in files.items()
+            for section, name, address, size in symbols
+        )
+        assert sorted(parse_elf_symbols(elf_file).data_rows()) == expected
+
+    @pytest.mark.parametrize(
+        "corrupt",
+        [
+            # truncated in the section headers
+            lambda elf: elf[:-8],
+            # e_shentsize smaller than a section header
+            lambda elf: struct.pack_into("<H", elf, 46, 4),
+            # e_shstrndx past the sections
+            lambda elf: struct.pack_into("<H", elf, 50, 99),
+            # sh_link of the symbol table past the sections
+            lambda elf: struct.pack_into(
+                "<I", elf, struct.unpack_from("<I", elf, 32)[0] + 2 * 40 + 24, 99
+            ),
+        ],
+        ids=["truncated", "shentsize", "shstrndx", "symtab_link"],
+    )
+    def test_corrupted_elf_upload_is_rejected(self, sqlite_app, corrupt):
+        """
+        Test that an ELF upload with a corrupted header or section table
+        is answered with 400 like an invalid map file
+
+        Returns:
+            Nothing
+        """
+        elf_file = io.BytesIO()
+        write_elf({"main.o": [(".text", "main", 0x8000000, 4)]}, elf_file)
+        elf = bytearray(elf_file.getvalue())
+        elf = corrupt(elf) or elf
+
+        response = sqlite_app.test_client().post(
+            "/api/v0/map-file/analyse",
+            headers={"Authorization": "Bearer token"},
+            data={
+                "commit_hash": "corrupted",
+                "commit_msg": "",
+                "branch_name": "dev",
+                "bss_size": 0,
+                "text_size": 0,
+                "rodata_size": 0,
+                "data_size": 0,
+                "free_flash_size": 0,
+                "elf_file": (io.BytesIO(bytes(elf)), "firmware.elf"),
+            },
+        )
+        assert response.status_code == 400, response.json
+        assert response.json["elf_file"][0].startswith("ELF")
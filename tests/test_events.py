@@ -0,0 +1,108 @@
+import os
+import socket
+import threading
+
+from app.events import EventBus
+
+
+class TestEvents:
+    def test_events_reach_subscribers_of_all_workers(self, tmp_path):
+        """
+        Test that an event published by one worker is received by
+        subscribers of every worker sharing the directory
+
+        Returns:
+            Nothing
+        """
+        worker1 = EventBus(str(tmp_path))
+        worker2 = EventBus(str(tmp_path))
+        publisher = EventBus(str(tmp_path))
+
+        with worker1.subscribe() as subscriber1, worker2.subscribe() as subscriber2:
+            with worker2.subscribe() as closed:
+                publisher.publish({"id": 1})
+                assert closed.get(timeout=5) == {"id": 1}
+            publisher.publish({"id": 2})
+
+            assert subscriber1.get(timeout=5) == {"id": 1}
+            assert subscriber1.get(timeout=5) == {"id": 2}
+            assert subscriber2.get(timeout=5) == {"id": 1}
+            assert subscriber2.get(timeout=5) == {"id": 2}
+        assert closed.empty()
+
+    def test_malformed_datagram_is_skipped(self, tmp_path):
+        """
+        Test that a datagram that is not JSON does not stop the receiver
+
+        Returns:
+            Nothing
+        """
+        worker = EventBus(str(tmp_path))
+        publisher = EventBus(str(tmp_path))
+
+        with worker.subscribe() as subscriber:
+            (name,) = os.listdir(tmp_path)
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+                sender.sendto(b"\xff not json", str(tmp_path / name))
+            publisher.publish({"id": 1})
+            assert subscriber.get(timeout=5) == {"id": 1}
+
+    def test_open_streams_are_limited(self, sqlite_app):
+        """
+        Test that streams above ADMISSION_EVENTS_LIMIT get an empty stream
+        telling EventSource to reconnect later and a closed stream frees its
+        slot
+
+        Returns:
+            Nothing
+        """
+        client = sqlite_app.test_client()
+        streams = [client.get("/api/v0/events", buffered=False) for _ in range(2)]
+        assert [stream.status_code for stream in streams] == [200, 200]
+
+        response = client.get("/api/v0/events")
+        assert response.status_code == 200
+        assert response.mimetype == "text/event-stream"
+        assert response.text.endswith("retry: 5000\n\n")
+        assert "Retry-After" in response.headers
+
+        streams.pop().close()
+        response = client.get("/api/v0/events", buffered=False)
+        assert response.status_code == 200
+        response.close()
+        for stream in streams:
+            stream.close()
+
+    def test_stream_resumes_and_pushes_new_builds(self, sqlite_app, upload_map_file):
+        """
+        Test that the stream sends builds after Last-Event-ID first and then
+        builds uploaded while it is open
+
+        Returns:
+            Nothing
+        """
+        client = sqlite_app.test_client()
+        upload_map_file(client, "first", "dev")
+        upload_map_file(client, "second", "user/feature")
+
+        response = client.get(
+            "/api/v0/events", headers={"Last-Event-ID": "1"}, buffered=False
+        )
+        assert response.mimetype == "text/event-stream"
+        chunks = iter(response.response)
+        assert next(chunks) == b"retry: 5000\n\n"
+        assert next(chunks).startswith(b"id: 2\nevent: build\ndata: ")
+
+        uploader = threading.Thread(
+            target=upload_map_file,
+            args=(sqlite_app.test_client(), "third", "dev"),
+        )
+        uploader.start()
+        chunk = next(chunks)
+        while chunk.startswith(b":"):
+            chunk = next(chunks)
+        uploader.join()
+
+        assert chunk.startswith(b"id: 3\nevent: build\ndata: ")
+        assert b'"commit": "third"' in chunk
+        response.close()
@@ -0,0 +1,186 @@
+import csv
+import gzip
+import io
+
+import pyarrow
+import pyarrow.parquet
+import pytest
+
+from app.app import Data, Header, db
+from app.settings import get_settings
+
+
+def insert_build(commit: str, branch_name: str, rows: int) -> int:
+    header = Header(
+        commit=commit,
+        commit_msg="",
+        branch_name=branch_name,
+        bss_size=0,
+        text_size=0,
+        rodata_size=0,
+        data_size=0,
+        free_flash_size=0,
+    )
+    db.session.add(header)
+    db.session.flush()
+    db.session.add_all(
+        Data(
+            header_id=header.id,
+            section=".text",
+            address=hex(0x8000000 + number * 4),
+            size=4,
+            name=f"function_{number}",
+            lib="",
+            obj_name="main.o",
+        )
+        for number in range(rows)
+    )
+    db.session.commit()
+    return header.id
+
+
+@pytest.fixture
+def export_app(sqlite_app):
+    with sqlite_app.app_context():
+        insert_build("first", "dev", 5)
+        insert_build("second", "dev", 7)
+        insert_build("third", "release", 3)
+    return sqlite_app
+
+
+class TestExport:
+    def test_csv_export_of_branch(self, export_app):
+        """
+        Test that the export endpoint streams data rows of the chosen builds
+        as gzip compressed CSV in row groups, only with a valid token
+
+        Returns:
+            Nothing
+        """
+        client = export_app.test_client()
+
+        response = client.get("/api/v0/export?branch_name=dev")
+        assert response.status_code == 401
+
+        response = client.get(
+            "/api/v0/export?branch_name=dev",
+            headers={"Authorization": "Bearer token"},
+        )
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.headers["Content-Type"] == "application/gzip"
+
+        rows = list(csv.reader(io.StringIO(gzip.decompress(response.data).decode())))
+        response.close()
+        assert rows[0][:4] == ["header_id", "datetime", "commit", "branch_name"]
+        assert [row[2] for row in rows[1:]] == ["first"] * 5 + ["second"] * 7
+        assert rows[1][5:] == [".text", "0x8000000", "4", "function_0", "", "main.o"]
+
+        # the admission slot of the stream is released when its body is closed
+        response = client.get(
+            "/api/v0/export?header_ids=3",
+            headers={"Authorization": "Bearer token"},
+        )
+        assert response.status_code == 200
+
+    def test_parquet_export_round_trip(self, export_app, tmp_path):
+        """
+        Test that the Parquet export reads back with pyarrow with the typed
+        columns and a row group per group of rows
+
+        Returns:
+            Nothing
+        """
+        client = export_app.test_client()
+        client.environ_base["HTTP_AUTHORIZATION"] = "Bearer token"
+
+        response = client.get("/api/v0/export?branch_name=dev&format=parquet")
+        assert response.status_code == 200
+        assert response.headers["Content-Type"] == "application/vnd.apache.parquet"
+        data = response.data
+        response.close()
+
+        table = pyarrow.parquet.read_table(io.BytesIO(data))
+        assert table.column_names == [
+            "header_id",
+            "datetime",
+            "commit",
+            "branch_name",
+            "pullrequest_id",
+            "section",
+            "address",
+            "size",
+            "name",
+            "lib",
+            "obj_name",
+        ]
+        assert pyarrow.types.is_timestamp(table.schema.field("datetime").type)
+        assert table.column("commit").to_pylist() == ["first"] * 5 + ["second"] * 7
+        assert table.column("size").to_pylist() == [4] * 12
+        assert table.column("name").to_pylist()[:2] == ["function_0", "function_1"]
+
+        output = tmp_path / "export.parquet"
+        result = export_app.test_cli_runner().invoke(
+            args=["export", str(output), "--header-ids", "1,3"]
+            + ["--row-group-size", "2"]
+        )
+        assert result.exit_code == 0, result.output
+        assert pyarrow.parquet.ParquetFile(output).metadata.num_row_groups == 4
+        table = pyarrow.parquet.read_table(output)
+        assert table.column("header_id").to_pylist() == [1] * 5 + [3] * 3
+
+    def test_export_command(self, export_app, tmp_path):
+        """
+        Test that the export command writes chosen header ids to a file
+
+        Returns:
+            Nothing
+        """
+        output = tmp_path / "export.csv.gz"
+        result = export_app.test_cli_runner().invoke(
+            args=["export", str(output), "--header-ids", "1,3"]
+            + ["--row-group-size", "2"]
+        )
+        assert result.exit_code == 0, result.output
+        assert "Exported 8 rows" in result.output
+
+        with gzip.open(output, "rt", newline="") as export_file:
+            rows = list(csv.reader(export_file))
+        assert [row[0] for row in rows[1:]] == ["1"] * 5 + ["3"] * 3
+
+    def test_invalid_export_request(self, export_app):
+        """
+        Test that an export without chosen builds or with an unknown format
+        is rejected
+
+        Returns:
+            Nothing
+        """
+        client = export_app.test_client()
+        client.environ_base["HTTP_AUTHORIZATION"] = "Bearer token"
+
+        assert client.get("/api/v0/export").status_code == 400
+        assert client.get("/api/v0/export?header_ids=1,x").status_code == 400
+        response = client.get("/api/v0/export?header_ids=1&format=xlsx")
+        assert response.status_code == 400
+
+    def test_export_can_be_profiled(self, export_app, tmp_path, monkeypatch):
+        """
+        Test that the profile query argument is not rejected as an unknown
+        export argument
+
+        Returns:
+            Nothing
+        """
+        monkeypatch.setenv("PROFILE_DIR", str(tmp_path / "profiles"))
+        get_settings.cache_clear()
+
+        response = export_app.test_client().get(
+            "/api/v0/export?header_ids=3&profile=1",
+            headers={"Authorization": "Bearer token"},
+        )
+        assert response.status_code == 200
+        assert "X-Profile-File" in response.headers
+        rows = list(csv.reader(io.StringIO(gzip.decompress(response.data).decode())))
+        response.close()
+        assert len(rows) == 4
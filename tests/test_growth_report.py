@@ -0,0 +1,47 @@
+from app.app import Data, db
+
+
+class TestGrowthReport:
+    def test_growth_with_steps(self, sqlite_app, upload_map_file):
+        """
+        Test that the symbol grown the most from the first to the last build
+        is first with the dev builds that changed its size
+
+        Returns:
+            Nothing
+        """
+        client = sqlite_app.test_client()
+        for commit in ["first", "second", "third", "fourth"]:
+            upload_map_file(client, commit, "dev")
+
+        with sqlite_app.app_context():
+            row = (
+                Data.query.filter_by(header_id=1, section=".text")
+                .order_by(Data.size)
+                .first()
+            )
+            name, path = row.name, row.path
+            for header_id, growth in [(2, 1000), (3, 1000), (4, 1500)]:
+                grown = Data.query.filter_by(header_id=header_id, name=name).first()
+                grown.size += growth
+            db.session.commit()
+
+        response = client.get(
+            "/api/v0/growth_report?from_branch_id=1&to_branch_id=4&top=3"
+        )
+        assert response.status_code == 200
+        report = response.json
+        assert report["builds"] == 4
+
+        symbol = report["symbols"][0]
+        assert (symbol["name"], symbol["growth"]) == (name, 1500)
+        assert [(step["commit"], step["delta"]) for step in symbol["steps"]] == [
+            ("second", 1000),
+            ("fourth", 500),
+        ]
+        obj = report["objects"][0]
+        assert (obj["path"], obj["growth"]) == (path, 1500)
+        assert sum(step["delta"] for step in obj["steps"]) == 1500
+
+        response = client.get("/api/v0/growth_report?from_branch_id=4&to_branch_id=1")
+        assert response.status_code == 400
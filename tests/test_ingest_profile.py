@@ -0,0 +1,62 @@
+from app.app import Data, DataArchive, INTERESTING_SECTIONS, db
+from app.settings import get_settings
+
+
+class TestIngestProfile:
+    def test_cold_rows_are_archived(self, sqlite_app, upload_map_file):
+        """
+        Test that the archive profile stores only rows of interesting sections
+        with a size in data and the other rows in data_archive
+
+        Returns:
+            Nothing
+        """
+        assert get_settings().ingest_profile == "archive"
+        upload_map_file(sqlite_app.test_client(), "archived", "dev")
+
+        with sqlite_app.app_context():
+            hot_rows = Data.query.count()
+            cold_rows = DataArchive.query.count()
+            assert hot_rows > 0 and cold_rows > 0
+            assert (
+                Data.query.filter(
+                    Data.section.not_in(INTERESTING_SECTIONS) | (Data.size <= 0)
+                ).count()
+                == 0
+            )
+            db.session.remove()
+
+        response = sqlite_app.test_client().get("/api/v0/commit_full_data?branch_id=1")
+        assert len(response.json) == hot_rows
+
+    def test_hot_profile_drops_cold_rows(
+        self, sqlite_app, monkeypatch, upload_map_file
+    ):
+        """
+        Test that the hot profile does not store cold rows and the archive
+        command moves cold rows stored with the all profile
+
+        Returns:
+            Nothing
+        """
+        monkeypatch.setenv("INGEST_PROFILE", "hot")
+        get_settings.cache_clear()
+        upload_map_file(sqlite_app.test_client(), "hot", "dev")
+
+        monkeypatch.setenv("INGEST_PROFILE", "all")
+        get_settings.cache_clear()
+        upload_map_file(sqlite_app.test_client(), "all", "dev")
+
+        with sqlite_app.app_context():
+            assert DataArchive.query.count() == 0
+            hot_rows = Data.query.filter_by(header_id=1).count()
+            assert Data.query.filter_by(header_id=2).count() > hot_rows
+            db.session.remove()
+
+        result = sqlite_app.test_cli_runner().invoke(args=["archive-data"])
+        assert result.exit_code == 0, result.output
+
+        with sqlite_app.app_context():
+            assert Data.query.filter_by(header_id=2).count() == hot_rows
+            assert DataArchive.query.filter_by(header_id=2).count() > 0
+            db.session.remove()
@@ -0,0 +1,159 @@
+import gzip
+import io
+
+import pytest
+import zstandard
+
+from app.services.map_file import MapFileTooLarge, open_map_file
+from app.services.map_parser import (
+    ParsedData,
+    iter_map_text,
+    parse_map_chunk,
+    parse_map_file_parallel,
+    parse_map_text,
+    parse_sections,
+    parse_sections_mmap,
+    save_parsed_data,
+    skip_memory_configuration,
+    split_map_text,
+)
+
+MAP_FILE = "tests/assets/firmware.elf.map"
+
+
+class TestParallelMapParser:
+    def test_parallel_parser_matches_serial(self):
+        """
+        Test that parsing the map file in a process pool gives
+        the same rows in the same order as the serial parser
+
+        Returns:
+            Nothing
+        """
+        with open(MAP_FILE, "rb") as map_file:
+            serial = save_parsed_data(parse_sections(map_file))
+
+        with open(MAP_FILE, "rb") as map_file:
+            parallel = parse_map_file_parallel(map_file, workers=2)
+
+        assert parallel == serial
+
+    def test_split_map_text_chunks_are_independent(self):
+        """
+        Test that map text split into many chunks, including chunks
+        starting in the middle of an output section, parses the same
+
+        Returns:
+            Nothing
+        """
+        with open(MAP_FILE, "rb") as map_file:
+            serial = save_parsed_data(parse_sections(map_file))
+
+        with open(MAP_FILE, "rb") as map_file:
+            skip_memory_configuration(map_file)
+            s = map_file.read().decode().replace("\r", "")
+
+        chunks = split_map_text(s, 64)
+        assert len(chunks) > 1
+
+        rows = ParsedData()
+        for chunk in chunks:
+            rows.extend(parse_map_chunk(chunk))
+
+        assert rows == serial
+
+
+class TestStreamingMapParser:
+    def test_streamed_text_parses_as_whole_text(self):
+        """
+        Test that map text decoded and parsed in small blocks gives the rows
+        of the whole decoded text, including blocks splitting UTF-8 and CRLF
+
+        Returns:
+            Nothing
+        """
+        with open(MAP_FILE, "rb") as map_file:
+            plain = map_file.read().replace(b"\n", b"\r\n")
+        upload = io.BytesIO(plain)
+        skip_memory_configuration(upload)
+        whole = save_parsed_data(
+            parse_map_text(upload.read().decode().replace("\r", ""))
+        )
+
+        parts = list(iter_map_text(io.BytesIO(plain), block_size=4099))
+        assert len(parts) > 100
+
+        sections = []
+        for part in parts:
+            parse_map_text(part, sections)
+        assert save_parsed_data(sections) == whole
+        assert save_parsed_data(parse_sections(io.BytesIO(plain))) == whole
+
+
+class TestMmapMapParser:
+    def test_mmap_parser_matches_serial(self):
+        """
+        Test that parsing the memory-mapped map file, both from a file and
+        from an upload with CRLF line endings, gives the same rows
+
+        Returns:
+            Nothing
+        """
+        with open(MAP_FILE, "rb") as map_file:
+            serial = save_parsed_data(parse_sections(map_file))
+
+        with open(MAP_FILE, "rb") as map_file:
+            assert save_parsed_data(parse_sections_mmap(map_file)) == serial
+
+        with open(MAP_FILE, "rb") as map_file:
+            upload = io.BytesIO(map_file.read().replace(b"\n", b"\r\n"))
+        assert save_parsed_data(parse_sections_mmap(upload)) == serial
+
+
+class TestCompressedMapFile:
+    def test_gzip_map_file_matches_plain(self):
+        """
+        Test that gzip compressed map file detected by magic bytes
+        is parsed into the same rows by both parsers
+
+        Returns:
+            Nothing
+        """
+        with open(MAP_FILE, "rb") as map_file:
+            plain = map_file.read()
+        serial = save_parsed_data(parse_sections(io.BytesIO(plain)))
+
+        compressed = gzip.compress(plain)
+        map_file = open_map_file(io.BytesIO(compressed), None, len(plain))
+        assert save_parsed_data(parse_sections(map_file)) == serial
+
+        map_file = open_map_file(io.BytesIO(compressed), "gzip", len(plain))
+        assert save_parsed_data(parse_sections_mmap(map_file)) == serial
+
+    def test_zstd_map_file_matches_plain(self):
+        """
+        Test that zstd compressed map file is parsed into the same rows
+
+        Returns:
+            Nothing
+        """
+        with open(MAP_FILE, "rb") as map_file:
+            plain = map_file.read()
+        serial = save_parsed_data(parse_sections(io.BytesIO(plain)))
+
+        compressed = zstandard.ZstdCompressor().compress(plain)
+        map_file = open_map_file(io.BytesIO(compressed), None, len(plain))
+        assert save_parsed_data(parse_sections(map_file)) == serial
+
+    def test_decompressed_size_limit(self):
+        """
+        Test that reading more than the limit from a compressed map file fails
+
+        Returns:
+            Nothing
+        """
+        compressed = gzip.compress(b"\n" * 1024 * 1024)
+        map_file = open_map_file(io.BytesIO(compressed), None, 1024)
+
+        with pytest.raises(MapFileTooLarge):
+            map_file.read()
@@ -0,0 +1,62 @@
+from app.app import Data, commit_diff_data, db
+from app.settings import get_settings
+
+
+class TestMergeDiff:
+    def test_merge_diff_equals_hash_diff(
+        self, sqlite_app, monkeypatch, upload_map_file
+    ):
+        """
+        Test that the merge diff mode returns the sections and files of the
+        hash diff for changed, removed, added and duplicate symbols
+
+        Returns:
+            Nothing
+        """
+        client = sqlite_app.test_client()
+        upload_map_file(client, "first", "dev")
+        upload_map_file(client, "second", "dev")
+
+        with sqlite_app.app_context():
+            rows = Data.query.filter_by(header_id=2, section=".text").limit(3).all()
+            rows[0].size += 100
+            db.session.delete(rows[1])
+            db.session.add(
+                Data(
+                    header_id=2,
+                    section=".text",
+                    address="0x0",
+                    size=rows[2].size,
+                    name=rows[2].name,
+                    lib=rows[2].lib,
+                    obj_name=rows[2].obj_name,
+                    path=rows[2].path,
+                )
+            )
+            db.session.add(
+                Data(
+                    header_id=2,
+                    section=".data",
+                    address="0x0",
+                    size=8,
+                    name="added_symbol",
+                    lib="",
+                    obj_name="added.o",
+                    path="added.o",
+                )
+            )
+            db.session.commit()
+
+        diffs = {}
+        for mode in ("hash", "merge"):
+            monkeypatch.setenv("DIFF_MODE", mode)
+            get_settings.cache_clear()
+            with sqlite_app.test_request_context():
+                diffs[mode] = commit_diff_data(2, 1)
+                db.session.remove()
+
+        assert diffs["merge"] == diffs["hash"]
+        assert diffs["merge"]["sections"][".data"]["objects"]["added.o"] == {
+            "size": 8,
+            "symbols": {"added_symbol": 8},
+        }
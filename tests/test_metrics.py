@@ -0,0 +1,18 @@
+class TestMetrics:
+    def test_metrics_of_requests(self, sqlite_app):
+        """
+        Test that /metrics returns the Prometheus histograms with
+        the duration of a served request
+
+        Returns:
+            Nothing
+        """
+        client = sqlite_app.test_client()
+        assert client.get("/api/v0/ping").status_code == 200
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.content_type.startswith("text/plain")
+        assert 'report_request_seconds_count{endpoint="api.api_v0_ping"' in (
+            response.text
+        )
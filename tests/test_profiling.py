@@ -0,0 +1,44 @@
+class TestProfiling:
+    def test_profile_header_values(self, sqlite_app):
+        """
+        Test that X-Profile "inline" and true values profile the request,
+        false values and unauthenticated clients get the response
+
+        Returns:
+            Nothing
+        """
+        client = sqlite_app.test_client()
+        auth = {"Authorization": "Bearer token"}
+
+        for value in ["0", "false", "off", "no"]:
+            response = client.get(
+                "/api/v0/ping", headers=auth | {"X-Profile": value}
+            )
+            assert response.json == {"status": "ok"}
+
+        response = client.get("/api/v0/ping", headers={"X-Profile": "inline"})
+        assert response.json == {"status": "ok"}
+
+        for value in ["inline", "1", "true"]:
+            response = client.get(
+                "/api/v0/ping", headers=auth | {"X-Profile": value}
+            )
+            assert response.mimetype == "text/plain"
+            assert "cumulative" in response.text
+
+    def test_inline_profile_keeps_status(self, sqlite_app):
+        """
+        Test that an inline profile of a failed request keeps its status and
+        names it in the first line
+
+        Returns:
+            Nothing
+        """
+        response = sqlite_app.test_client().get(
+            "/api/v0/commit_full_data",
+            headers={"Authorization": "Bearer token", "X-Profile": "inline"},
+        )
+        assert response.status_code == 400
+        assert response.mimetype == "text/plain"
+        first_line = response.text.splitlines()[0]
+        assert first_line == "GET /api/v0/commit_full_data 400 BAD REQUEST"
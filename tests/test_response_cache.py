@@ -0,0 +1,72 @@
+import os
+import time
+
+from app.app import cache_key, prewarm_commit_data
+from app.response_cache import ResponseCache
+
+
+class TestResponseCache:
+    def test_least_recently_used_are_evicted(self, tmp_path):
+        """
+        Test that responses above the size limit are removed starting
+        from the least recently read one
+
+        Returns:
+            Nothing
+        """
+        cache = ResponseCache(str(tmp_path), max_size=25)
+        cache.set(("brief", 1), b"1" * 10)
+        cache.set(("brief", 2), b"2" * 10)
+        past = time.time() - 60
+        os.utime(cache.path(("brief", 1)), (past, past))
+        os.utime(cache.path(("brief", 2)), (past - 60, past - 60))
+
+        assert cache.get(("brief", 2)) == b"2" * 10
+        cache.set(("brief", 3), b"3" * 10)
+
+        assert cache.get(("brief", 1)) is None
+        assert cache.get(("brief", 2)) == b"2" * 10
+        assert cache.get(("brief", 3)) == b"3" * 10
+
+    def test_cache_is_off_without_directory(self):
+        """
+        Test that the response cache does not store responses unless
+        its directory is set
+
+        Returns:
+            Nothing
+        """
+        cache = ResponseCache(None, max_size=25)
+        assert not cache.enabled
+        cache.set(("brief", 1), b"1" * 10)
+        assert cache.get(("brief", 1)) is None
+        cache.clear()
+
+    def test_prewarmed_responses_are_served(self, sqlite_app, upload_map_file):
+        """
+        Test that prewarming stores brief data of the new build and its diff
+        against the previous build, and the endpoints return them unchanged
+
+        Returns:
+            Nothing
+        """
+        client = sqlite_app.test_client()
+        upload_map_file(client, "first", "dev")
+        upload_map_file(client, "second", "dev")
+        prewarm_commit_data(sqlite_app, 2)
+
+        cache = sqlite_app.extensions["response_cache"]
+        with sqlite_app.app_context():
+            brief = cache.get(cache_key("commit_brief_data", 2))
+            diff = cache.get(cache_key("commit_diff_data", 2, 1))
+        assert brief is not None
+        assert diff is not None
+
+        response = client.get("/api/v0/commit_brief_data?branch_id=2")
+        assert response.data == brief
+        response = client.get("/api/v0/commit_diff_data?branch_ids=2,1")
+        assert response.data == diff
+
+        cache.max_size = 0
+        response = client.get("/api/v0/commit_brief_data?branch_id=2")
+        assert response.data == brief
@@ -0,0 +1,127 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_share_result(self):
+        """
+        Test that concurrent calls with the same key run the function once
+        and every caller gets its result
+
+        Returns:
+            Nothing
+        """
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return b"result"
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            leader = executor.submit(flights.do, ("diff", 1, 2), compute)
+            started.wait(5)
+            followers = [
+                executor.submit(flights.do, ("diff", 1, 2), compute) for _ in range(3)
+            ]
+            other = executor.submit(flights.do, ("diff", 2, 1), lambda: b"other")
+            assert other.result(5) == b"other"
+            # let the followers reach the in-flight call
+            time.sleep(0.2)
+            release.set()
+
+            assert leader.result(5) == b"result"
+            assert [future.result(5) for future in followers] == [b"result"] * 3
+        assert len(calls) == 1
+
+    def test_error_is_raised_in_waiting_calls(self):
+        """
+        Test that an error of the computation is raised in every waiting
+        call and the next call computes again
+
+        Returns:
+            Nothing
+        """
+        flights = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def fail():
+            started.set()
+            release.wait(5)
+            raise ValueError("database is gone")
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(flights.do, ("brief", 1), fail)
+            started.wait(5)
+            follower = executor.submit(flights.do, ("brief", 1), fail)
+            release.set()
+
+            with pytest.raises(ValueError):
+                leader.result(5)
+            with pytest.raises(ValueError):
+                follower.result(5)
+
+        assert flights.do(("brief", 1), lambda: b"ok") == b"ok"
+
+    def test_workers_share_result_through_directory(self, tmp_path):
+        """
+        Test that another worker using the same directory gets the result
+        within ttl instead of computing it again
+
+        Returns:
+            Nothing
+        """
+        worker1 = SingleFlight(str(tmp_path), ttl=60)
+        worker2 = SingleFlight(str(tmp_path), ttl=60)
+
+        assert worker1.do(("full", 1), lambda: b"result") == b"result"
+        assert worker2.do(("full", 1), lambda: b"again") == b"result"
+        assert worker2.do(("full", 2), lambda: b"other") == b"other"
+
+        expired = SingleFlight(str(tmp_path), ttl=0)
+        assert expired.do(("full", 1), lambda: b"again") == b"again"
+
+    def test_keys_do_not_wait_for_each_other(self, tmp_path):
+        """
+        Test that a slow computation of one key does not hold up another key
+        of a worker sharing the directory, and unused lock files are removed
+
+        Returns:
+            Nothing
+        """
+        flights = SingleFlight(str(tmp_path), ttl=60)
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return b"slow"
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            leader = executor.submit(flights.do, ("diff", 1, 2), slow)
+            started.wait(5)
+            other_worker = SingleFlight(str(tmp_path), ttl=60)
+            start_time = time.perf_counter()
+            for key in range(300):
+                assert other_worker.do(("full", key), lambda: b"fast") == b"fast"
+            assert time.perf_counter() - start_time < 5
+            release.set()
+            assert leader.result(5) == b"slow"
+
+        assert len(list(tmp_path.glob("*.lock"))) == 301
+        expired = SingleFlight(str(tmp_path), ttl=0)
+        time.sleep(0.01)
+        expired.do(("brief", 1), lambda: b"brief")
+        # only the lock of the last call is left
+        assert len(list(tmp_path.glob("*.lock"))) == 1
@@ -0,0 +1,128 @@
+from app.app import Data, Symbol, SymbolTrigram, db
+from app.settings import get_settings
+from app.symbol_search import trigrams
+
+
+class TestSymbolSearch:
+    def test_search_modes_and_scope(self, sqlite_app, upload_map_file):
+        """
+        Test that symbols are found by prefix, substring and misspelled
+        name, scoped by branch and header id range, and paginated
+
+        Returns:
+            Nothing
+        """
+        client = sqlite_app.test_client()
+        upload_map_file(client, "first", "dev")
+        upload_map_file(client, "second", "feature")
+
+        def search(query: str) -> dict:
+            response = client.get(f"/api/v0/symbols/search?{query}")
+            assert response.status_code == 200
+            return response.json
+
+        prefix = search("q=furi_event_flag_&mode=prefix")
+        names = [result["value"] for result in prefix["results"]]
+        assert "furi_event_flag_set" in names
+        assert all(name.startswith("furi_event_flag_") for name in names)
+        assert prefix["results"][0]["builds"] == 2
+
+        substring = search("q=EVENT_FLAG_SET")
+        assert substring["results"][0]["value"] == "furi_event_flag_set"
+
+        fuzzy = search("q=furi_evnt_flag_set&mode=fuzzy")
+        assert fuzzy["results"][0]["value"] == "furi_event_flag_set"
+
+        path = search("q=event_flag.o&kind=path")
+        assert path["results"][0]["value"].endswith("/event_flag.o")
+
+        scoped = search("q=furi_event_flag_set&branch_name=feature")
+        assert scoped["results"][0]["builds"] == 1
+        assert scoped["results"][0]["first"]["commit"] == "second"
+        scoped = search("q=furi_event_flag_set&to_branch_id=1")
+        assert scoped["results"][0]["last"]["commit"] == "first"
+
+        first_page = search("q=furi_&per_page=2")
+        second_page = search("q=furi_&per_page=2&page=2")
+        assert first_page["total"] == second_page["total"] > 4
+        assert len(first_page["results"]) == len(second_page["results"]) == 2
+        assert first_page["results"][0] != second_page["results"][0]
+
+    def test_candidates_are_matched_and_scoped_before_limit(
+        self, sqlite_app, upload_map_file, monkeypatch
+    ):
+        """
+        Test that the candidate limit keeps the best substring matches in the
+        searched builds and reports that more matched
+
+        Returns:
+            Nothing
+        """
+        client = sqlite_app.test_client()
+        upload_map_file(client, "first", "dev")
+        upload_map_file(client, "second", "dev")
+        with sqlite_app.app_context():
+            # the second build keeps a single furi_ symbol
+            Data.query.filter(Data.header_id == 2).filter(
+                Data.name != "furi_event_flag_set"
+            ).delete()
+            db.session.commit()
+
+        def search(query: str) -> dict:
+            response = client.get(f"/api/v0/symbols/search?{query}")
+            assert response.status_code == 200
+            return response.json
+
+        everything = search("q=FURI_&per_page=200")
+        assert not everything["truncated"]
+        assert everything["total"] > 5
+
+        monkeypatch.setattr("app.symbol_search.MAX_CANDIDATES", 5)
+        limited = search("q=FURI_&per_page=200")
+        assert limited["truncated"]
+        assert limited["total"] == 5
+        assert limited["results"] == everything["results"][:5]
+
+        scoped = search("q=FURI_&from_branch_id=2")
+        assert not scoped["truncated"]
+        assert scoped["total"] == 1
+        assert scoped["results"][0]["value"] == "furi_event_flag_set"
+
+    def test_uploads_index_new_symbols_only(self, sqlite_app, upload_map_file):
+        """
+        Test that a second build of the same symbols adds no trigrams
+
+        Returns:
+            Nothing
+        """
+        client = sqlite_app.test_client()
+        upload_map_file(client, "first", "dev")
+        with sqlite_app.app_context():
+            symbols = Symbol.query.count()
+            trigram_rows = SymbolTrigram.query.count()
+            value = Symbol.query.first().value
+            assert trigram_rows >= len(trigrams(value))
+
+        upload_map_file(client, "second", "dev")
+        with sqlite_app.app_context():
+            assert Symbol.query.count() == symbols
+            assert SymbolTrigram.query.count() == trigram_rows
+
+    def test_search_can_be_profiled(self, sqlite_app, tmp_path, monkeypatch):
+        """
+        Test that the profile query argument is not rejected as an unknown
+        search argument
+
+        Returns:
+            Nothing
+        """
+        monkeypatch.setenv("PROFILE_DIR", str(tmp_path / "profiles"))
+        get_settings.cache_clear()
+
+        response = sqlite_app.test_client().get(
+            "/api/v0/symbols/search?q=furi&profile=1",
+            headers={"Authorization": "Bearer token"},
+        )
+        assert response.status_code == 200, response.json
+        assert response.json["results"] == []
+        assert (tmp_path / "profiles" / response.headers["X-Profile-File"]).exists()